@@ -0,0 +1,75 @@
+"""
+Benchmark: listing outputs of many step crates with ROCrate vs the lightweight CrateView.
+
+Usage: python benchmarks/bench_crate_reader.py [--count 10000] [--jobs 1]
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from rocrate.rocrate import ROCrate
+
+from lp_sdk.parser.crate import CrateView, get_crates
+
+
+def _write_synthetic_crate(path: Path, index: int, n_files: int = 5):
+    """Write a step crate's metadata directly, without the data files or rocrate overhead"""
+    files = [f'output/file_{i}.txt' if i % 2 else f'input/file_{i}.txt' for i in range(n_files)]
+    graph = [
+        {
+            '@id': 'ro-crate-metadata.json',
+            '@type': 'CreativeWork',
+            'about': {'@id': './'},
+            'conformsTo': {'@id': 'https://w3id.org/ro/crate/1.1'}
+        },
+        {
+            '@id': './',
+            '@type': 'Dataset',
+            'name': f'step_{index}',
+            'hasPart': [{'@id': f} for f in files],
+            'mainEntity': {'@id': 'distributed_step'},
+        },
+        {
+            '@id': 'distributed_step',
+            '@type': ['CreateAction', 'HowTo', 'ActionAccessSpecification', 'Schedule'],
+        },
+        *[{'@id': f, '@type': 'File'} for f in files],
+    ]
+    path.mkdir(parents=True)
+    with open(path / 'ro-crate-metadata.json', 'w') as f:
+        json.dump({'@context': 'https://w3id.org/ro/crate/1.1/context', '@graph': graph}, f)
+
+
+def _list_outputs(root: Path, loader, jobs: int) -> int:
+    count = 0
+    for crate in get_crates(root, workers=jobs, loader=loader):
+        for file in crate.get_by_type('File'):
+            file_id = file['@id'] if isinstance(file, dict) else file.id
+            if file_id.startswith('output/'):
+                count += 1
+    return count
+
+
+@click.command()
+@click.option('--count', default=10000, help='Number of synthetic crates')
+@click.option('--jobs', default=1, help='Crate loading threads')
+def main(count, jobs):
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        for i in range(count):
+            _write_synthetic_crate(root / f'{i // 1000}' / f'step_{i}', i)
+
+        results = {}
+        for name, loader in [('ROCrate', ROCrate), ('CrateView', CrateView)]:
+            start = time.perf_counter()
+            n_outputs = _list_outputs(root, loader, jobs)
+            results[name] = time.perf_counter() - start
+            print(f'{name:>10}: {results[name]:8.3f}s ({n_outputs} outputs in {count} crates)')
+
+    print(f'   speedup: {results["ROCrate"] / results["CrateView"]:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Benchmark: LpProvCrate.build_from_cwl on tests/data/cwl_prov/packed.cwl, parsing the CWL vs cached definitions.
+
+Usage: python benchmarks/bench_cwl_cache.py [--repeat 20]
+"""
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from lp_sdk.provenance import LpProvCrate
+
+PACKED_CWL = Path(__file__).parent.parent / 'tests' / 'data' / 'cwl_prov' / 'packed.cwl'
+
+
+def _build(cache_dir: Path | None) -> float:
+    with tempfile.TemporaryDirectory() as d:
+        wf_file = Path(shutil.copy(PACKED_CWL, d))
+        start = time.perf_counter()
+        LpProvCrate(d).build_from_cwl(wf_file, cache_dir=cache_dir)
+        return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--repeat', default=20, help='Number of timing repeats')
+def main(repeat):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        _build(Path(cache_dir))  # Populate the cache
+        uncached = min(_build(None) for _ in range(repeat))
+        cached = min(_build(Path(cache_dir)) for _ in range(repeat))
+    print(f'uncached: {uncached * 1000:.2f} ms, cached: {cached * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: build_from_cwl for a generated packed workflow where many steps (in nested subworkflows) run a few tools.
+
+Usage: python benchmarks/bench_cwl_tools.py [--steps 100 --steps 1000] [--tools 5] [--subworkflows 10]
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from lp_sdk.provenance import LpProvCrate
+
+
+def _tool(tool_id: str) -> dict:
+    return {
+        'class': 'CommandLineTool',
+        'doc': f'Tool {tool_id}',
+        'inputs': [{'type': 'File', 'inputBinding': {}, 'id': f'#{tool_id}/input'}],
+        'outputs': [{'type': 'File', 'outputBinding': {'glob': 'output.txt'}, 'id': f'#{tool_id}/output'}],
+        'baseCommand': 'cat',
+        'stdout': 'output.txt',
+        'id': f'#{tool_id}',
+    }
+
+
+def _workflow(wf_id: str, runs: list[str]) -> dict:
+    """A linear workflow with a step running each of runs in turn"""
+    steps = []
+    source = f'#{wf_id}/input'
+    for i, run in enumerate(runs):
+        step_id = f'#{wf_id}/step{i}'
+        steps.append({'in': [{'source': source, 'id': f'{step_id}/input'}], 'out': [f'{step_id}/output'],
+                      'run': f'#{run}', 'id': step_id})
+        source = f'{step_id}/output'
+    return {
+        'class': 'Workflow',
+        'requirements': [{'class': 'SubworkflowFeatureRequirement'}],
+        'inputs': [{'type': 'File', 'id': f'#{wf_id}/input'}],
+        'outputs': [{'type': 'File', 'outputSource': source, 'id': f'#{wf_id}/output'}],
+        'steps': steps,
+        'id': f'#{wf_id}',
+    }
+
+
+def packed_workflow(n_steps: int, n_tools: int, n_subworkflows: int) -> dict:
+    """n_steps steps in each of n_subworkflows subworkflows, cycling through n_tools tools"""
+    tools = [f'tool{i}.cwl' for i in range(n_tools)]
+    subworkflows = [f'sub{i}.cwl' for i in range(n_subworkflows)]
+    graph = [_workflow('main', subworkflows)]
+    graph.extend(_workflow(sub, [tools[i % n_tools] for i in range(n_steps)]) for sub in subworkflows)
+    graph.extend(_tool(tool) for tool in tools)
+    return {'$graph': graph, 'cwlVersion': 'v1.0'}
+
+
+@click.command()
+@click.option('--steps', multiple=True, type=int, default=[100, 1000], help='Steps per subworkflow')
+@click.option('--tools', type=int, default=5, help='Number of distinct tools')
+@click.option('--subworkflows', type=int, default=10, help='Number of subworkflows')
+def main(steps, tools, subworkflows):
+    print(f'{"steps":>8} {"entities":>9} {"build (s)":>10}')
+    for n_steps in steps:
+        with tempfile.TemporaryDirectory() as d:
+            wf_file = Path(d) / 'packed.cwl'
+            wf_file.write_text(json.dumps(packed_workflow(n_steps, tools, subworkflows)))
+            cache_dir = Path(d) / 'cache'
+
+            # Parse the CWL (and cache it) first, so only building the crate is timed
+            LpProvCrate(d).build_from_cwl(wf_file, cache_dir=cache_dir)
+            crate = LpProvCrate(d, lean=True)
+            start = time.perf_counter()
+            crate.build_from_cwl(wf_file, cache_dir=cache_dir)
+            elapsed = time.perf_counter() - start
+            crate.write(compact=True)
+            n_entities = len(json.loads((Path(d) / 'ro-crate-metadata.json').read_text())['@graph'])
+
+        print(f'{n_steps * subworkflows:>8} {n_entities:>9} {elapsed:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: describing DistStepCrate output files (sha256, contentSize, encodingFormat): one thread reading each
+file, vs the thread pool of memory mapped reads, vs a second run hitting the (inode, size, mtime) cache.
+
+Usage: python benchmarks/bench_file_info.py [--files 8] [--size-mb 64]
+"""
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from lp_sdk.retrospective.crate import DistStepCrate
+from lp_sdk.retrospective.file_info import FileInfoCache
+
+
+def _sequential(path: Path, names: list[str]) -> float:
+    start = time.perf_counter()
+    for name in names:
+        hashlib.sha256((path / name).read_bytes()).hexdigest()
+    return time.perf_counter() - start
+
+
+def _describe(path: Path, names: list[str], cache: FileInfoCache) -> float:
+    start = time.perf_counter()
+    crate = DistStepCrate(path, file_info_cache=cache)
+    for name in names:
+        crate.add_file(name, describe=True)
+    crate.wait_file_info()
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--files', 'n_files', default=8, help='Number of data files')
+@click.option('--size-mb', default=64, help='Size of each data file')
+def main(n_files, size_mb):
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d)
+        names = [f'{i}.bin' for i in range(n_files)]
+        block = os.urandom(1024 * 1024)
+        for name in names:
+            with open(path / name, 'wb') as f:
+                f.writelines(block for _ in range(size_mb))
+
+        with FileInfoCache(path / 'cache.sqlite') as cache:
+            print(f'{n_files} files of {size_mb} MiB')
+            print(f'sequential read + sha256: {_sequential(path, names) * 1000:.1f} ms')
+            print(f'describe (thread pool, mmap): {_describe(path, names, cache) * 1000:.1f} ms')
+            print(f'describe (cached): {_describe(path, names, cache) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
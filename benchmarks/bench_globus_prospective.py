@@ -0,0 +1,33 @@
+"""
+Benchmark: parse_globus_wep on large flows, to check it scales linearly with the number of parameters and transfers.
+
+Usage: python benchmarks/bench_globus_prospective.py [--states 1000 --states 10000] [--repeat 3]
+"""
+import time
+
+import click
+from util import synthetic_wep
+
+from lp_sdk.parser.globus_prospective import parse_globus_wep
+from lp_sdk.parser.wep_parsing import parse_states
+
+
+@click.command()
+@click.option('--states', multiple=True, type=int, default=[1000, 5000, 20000], help='Number of WEP states')
+@click.option('--repeat', default=3, help='Number of timing repeats')
+def main(states, repeat):
+    print(f'{"states":>8} {"params":>8} {"time (s)":>9} {"per state (us)":>15}')
+    for n_states in states:
+        wep, flow_input = synthetic_wep(n_states)
+        parsed = parse_states(wep, flow_input)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            step_info, _ = parse_globus_wep(wep, flow_input, orch_epid='orch-ep', states=parsed)
+            timings.append(time.perf_counter() - start)
+        n_params = sum(len(info['input']) + len(info['output']) for name, info in step_info.items() if name != 'main')
+        print(f'{n_states:>8} {n_params:>8} {min(timings):>9.3f} {min(timings) / n_states * 1e6:>15.2f}')
+
+
+if __name__ == '__main__':
+    main()
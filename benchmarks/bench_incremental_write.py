@@ -0,0 +1,57 @@
+"""
+Benchmark: rewriting a crate with large data files after changing one of them, in full vs incrementally.
+
+Usage: python benchmarks/bench_incremental_write.py [--files 8] [--size-mb 64] [--entities 5000]
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from rocrate.model import ContextEntity
+from rocrate.rocrate import ROCrate
+
+from lp_sdk.provenance.placement import write_crate
+
+
+def _crate(src: Path, n_files: int, n_entities: int) -> ROCrate:
+    crate = ROCrate()
+    crate.root_dataset['datePublished'] = '2024-01-01T00:00:00'
+    for i in range(n_files):
+        crate.add_file(src / f'{i}.bin', f'data/{i}.bin')
+    for i in range(n_entities):
+        crate.add(ContextEntity(crate, f'#pv-{i}', {'@type': 'PropertyValue', 'name': f'p{i}', 'value': str(i)}))
+    return crate
+
+
+def _rewrite(src: Path, crate: ROCrate, incremental: bool) -> float:
+    with tempfile.TemporaryDirectory(dir=src.parent) as out:
+        write_crate(crate, out, incremental=incremental)
+        (src / '0.bin').write_bytes(os.urandom(1024))  # A small change to one file
+        start = time.perf_counter()
+        write_crate(crate, out, incremental=incremental)
+        return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--files', 'n_files', default=8, help='Number of data files')
+@click.option('--size-mb', default=64, help='Size of each data file')
+@click.option('--entities', 'n_entities', default=5000, help='Number of contextual entities')
+def main(n_files, size_mb, n_entities):
+    with tempfile.TemporaryDirectory() as d:
+        src = Path(d) / 'src'
+        src.mkdir()
+        block = os.urandom(1024 * 1024)
+        for i in range(n_files):
+            with open(src / f'{i}.bin', 'wb') as f:
+                f.writelines(block for _ in range(size_mb))
+        crate = _crate(src, n_files, n_entities)
+
+        print(f'{n_files} files of {size_mb} MiB, {n_entities} entities, one file changed')
+        print(f'full: {_rewrite(src, crate, False) * 1000:.1f} ms')
+        print(f'incremental: {_rewrite(src, crate, True) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark: parse_states with a flow input file embedding a large unreferenced payload, fully loaded vs lazily
+resolving only the paths the WEP references.
+
+Usage: python benchmarks/bench_lazy_input.py [--payload-mb 10 --payload-mb 100] [--states 100]
+"""
+import json
+import tempfile
+from pathlib import Path
+
+import click
+from util import measure, synthetic_wep
+
+from lp_sdk.parser.lazy_input import parse_states_from_file
+from lp_sdk.parser.wep_parsing import parse_states
+
+
+def _write_input(path: Path, flow_input: dict, payload_mb: int):
+    """Write the input with a payload of roughly payload_mb MiB of nested records, without building it in memory"""
+    record = json.dumps({'id': 'x' * 32, 'values': list(range(20)), 'meta': {'note': 'a [ bracket { in "text"'}})
+    n_records = payload_mb * 2 ** 20 // (len(record) + 2)
+    with open(path, 'w') as f:
+        f.write(json.dumps(flow_input)[:-2])  # Reopen the input object
+        f.write(', "payload": [')
+        f.write(', '.join(record for _ in range(n_records)))
+        f.write(']}}')
+
+
+@click.command()
+@click.option('--payload-mb', multiple=True, type=int, default=[10, 100], help='Size of the unreferenced payload')
+@click.option('--states', type=int, default=100, help='Number of WEP states')
+def main(payload_mb, states):
+    print(f'{"payload (MiB)":>14} {"mode":>6} {"time (s)":>9} {"peak (MiB)":>11}')
+    wep, flow_input = synthetic_wep(states)
+    for size in payload_mb:
+        results = {}
+        with tempfile.TemporaryDirectory() as d:
+            input_path = Path(d) / 'input.json'
+            _write_input(input_path, flow_input, size)
+
+            with measure(results, 'full'), open(input_path) as f:
+                full = parse_states(wep, json.load(f))
+            with measure(results, 'lazy'):
+                lazy = parse_states_from_file(wep, input_path)
+            assert full == lazy
+
+        for mode, (elapsed, peak) in results.items():
+            print(f'{size:>14} {mode:>6} {elapsed:>9.3f} {peak / 2 ** 20:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: writing a crate with large data files, by placement strategy (ROCrate.write copies sequentially).
+
+Usage: python benchmarks/bench_placement.py [--files 8] [--size-mb 64]
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from rocrate.rocrate import ROCrate
+
+from lp_sdk.provenance.placement import Placement, write_crate
+
+
+def _crate(src: Path, n_files: int) -> ROCrate:
+    crate = ROCrate()
+    crate.root_dataset['datePublished'] = '2024-01-01T00:00:00'
+    for i in range(n_files):
+        crate.add_file(src / f'{i}.bin', f'data/{i}.bin')
+    return crate
+
+
+def _write(src: Path, n_files: int, placement: Placement | None) -> float:
+    with tempfile.TemporaryDirectory(dir=src.parent) as out:
+        crate = _crate(src, n_files)
+        start = time.perf_counter()
+        if placement is None:
+            crate.write(out)
+        else:
+            write_crate(crate, out, placement)
+        return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--files', 'n_files', default=8, help='Number of data files')
+@click.option('--size-mb', default=64, help='Size of each data file')
+def main(n_files, size_mb):
+    with tempfile.TemporaryDirectory() as d:
+        src = Path(d) / 'src'
+        src.mkdir()
+        block = os.urandom(1024 * 1024)
+        for i in range(n_files):
+            with open(src / f'{i}.bin', 'wb') as f:
+                f.writelines(block for _ in range(size_mb))
+
+        print(f'{n_files} files of {size_mb} MiB')
+        print(f'rocrate: {_write(src, n_files, None) * 1000:.1f} ms')
+        for placement in Placement:
+            print(f'{placement.value}: {_write(src, n_files, placement) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: building an LpProvCrate from large synthetic WEPs (build_from_wep, from the output of parse_globus_wep),
+with the rocrate object model vs the lean backend. Each step adds ~8 entities, so the defaults give ~1k/10k/100k
+entities.
+
+Usage: python benchmarks/bench_provcrate.py [--steps 125 --steps 1250] [--mode rocrate --mode lean --mode compact]
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from util import measure, synthetic_wep
+
+from lp_sdk.parser.globus_prospective import parse_globus_wep
+from lp_sdk.provenance import LpProvCrate
+
+MODES = ('rocrate', 'lean', 'compact')
+
+
+def _parsed(parsed):
+    """A parser for build_from_wep returning parsed, whatever the WEP"""
+    def parser(_wep):
+        return parsed
+    return parser
+
+
+def _build_and_write(wep_file: Path, parser, mode: str):
+    crate = LpProvCrate(wep_file.parent, lean=mode != 'rocrate')
+    start = time.perf_counter()
+    crate.build_from_wep(wep_file, parser)
+    built = time.perf_counter()
+    crate.write(compact=mode == 'compact')
+    return built - start, time.perf_counter() - built
+
+
+@click.command()
+@click.option('--steps', multiple=True, type=int, default=[125, 1250, 12500], help='Number of compute steps')
+@click.option('--mode', 'modes', multiple=True, type=click.Choice(MODES), default=MODES,
+              help='Backends to run: rocrate, lean, or lean with compact output')
+def main(steps, modes):
+    print(f'{"steps":>8} {"entities":>9} {"mode":>8} {"build (s)":>10} {"write (s)":>10} {"peak (MiB)":>11}')
+    for n_steps in steps:
+        # Alternating transfer/compute states
+        wep, flow_input = synthetic_wep(n_steps * 2)
+        # Parsed once up front, so only the crate backend is measured
+        parsed = parse_globus_wep(wep, flow_input, orch_epid='orch-ep')
+        parser = _parsed(parsed)
+        for mode in modes:
+            with tempfile.TemporaryDirectory() as d:
+                wep_file = Path(d) / 'WEP.json'
+                wep_file.write_text(json.dumps(wep))
+                build, write = _build_and_write(wep_file, parser, mode)
+                n_entities = len(json.loads((Path(d) / 'ro-crate-metadata.json').read_text())['@graph'])
+
+            # Timed and traced separately, as tracing slows allocation-heavy code unevenly
+            results = {}
+            with tempfile.TemporaryDirectory() as d:
+                wep_file = Path(d) / 'WEP.json'
+                wep_file.write_text(json.dumps(wep))
+                with measure(results, mode):
+                    _build_and_write(wep_file, parser, mode)
+
+            print(f'{n_steps:>8} {n_entities:>9} {mode:>8} {build:>10.3f} {write:>10.3f} '
+                  f'{results[mode][1] / 2 ** 20:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark: recording N actions in a DistStepCrate from separate task invocations, reopening and writing the crate
+each time vs appending to the journal and compacting once.
+
+Usage: python benchmarks/bench_step_journal.py [--actions 200]
+"""
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from lp_sdk.retrospective.crate import DistStepCrate
+
+
+def _record(crate: DistStepCrate, i: int):
+    pv = crate.add_property(f'#pv-{i}', f'p{i}', str(i))
+    crate.add_create_action(f'#create-{i}', {'name': f'action {i}', 'object': [{'@id': pv.id}]})
+
+
+def _rewrite(path: Path, n_actions: int) -> float:
+    start = time.perf_counter()
+    for i in range(n_actions):
+        crate = DistStepCrate(path)
+        _record(crate, i)
+        crate.write()
+    return time.perf_counter() - start
+
+
+def _journal(path: Path, n_actions: int) -> float:
+    start = time.perf_counter()
+    for i in range(n_actions):
+        _record(DistStepCrate(path, journal=True), i)
+    DistStepCrate(path, journal=True).compact()
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--actions', 'n_actions', default=200, help='Number of actions recorded')
+def main(n_actions):
+    for name, run in (('reopen + write', _rewrite), ('journal + compact', _journal)):
+        with tempfile.TemporaryDirectory() as d:
+            print(f'{name}: {run(Path(d), n_actions) * 1000:.1f} ms for {n_actions} actions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark: parse_states vs ParseCache hits, in memory and from an on-disk cache directory.
+
+Usage: python benchmarks/bench_wep_cache.py [--states 1000 --states 10000] [--repeat 3]
+"""
+import tempfile
+import time
+
+import click
+from util import synthetic_wep
+
+from lp_sdk.parser.wep_cache import ParseCache
+from lp_sdk.parser.wep_parsing import parse_states
+
+
+def _parse_from_disk(cache_dir: str, wep: dict, flow_input: dict):
+    """Parse with a fresh cache, so every parse is loaded from disk"""
+    return ParseCache(cache_dir=cache_dir).parse_states(wep, flow_input)
+
+
+def _best_of(repeat: int, func, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option('--states', multiple=True, type=int, default=[1000, 10000], help='Number of WEP states')
+@click.option('--repeat', default=3, help='Number of timing repeats')
+def main(states, repeat):
+    print(f'{"states":>8} {"parse (s)":>10} {"disk hit (s)":>13} {"memory hit (s)":>15}')
+    for n_states in states:
+        wep, flow_input = synthetic_wep(n_states)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            ParseCache(cache_dir=cache_dir).parse_states(wep, flow_input)
+
+            parse = _best_of(repeat, parse_states, wep, flow_input)
+            disk = _best_of(repeat, _parse_from_disk, cache_dir, wep, flow_input)
+            cache = ParseCache(cache_dir=cache_dir)
+            cache.parse_states(wep, flow_input)
+            memory = _best_of(repeat, cache.parse_states, wep, flow_input)
+
+        print(f'{n_states:>8} {parse:>10.3f} {disk:>13.3f} {memory:>15.3f}')
+
+
+if __name__ == '__main__':
+    main()
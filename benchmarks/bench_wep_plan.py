@@ -0,0 +1,54 @@
+"""
+Benchmark: parsing one WEP against many inputs, parse_states in a loop vs a compiled WepPlan.
+
+Usage: python benchmarks/bench_wep_plan.py [--states 50] [--inputs 2000] [--repeat 3]
+"""
+import copy
+import time
+
+import click
+from util import synthetic_wep
+
+from lp_sdk.parser.wep_parsing import compile_wep, parse_states
+
+
+@click.command()
+@click.option('--states', default=50, help='Number of WEP states')
+@click.option('--inputs', default=2000, help='Number of distinct inputs to bind')
+@click.option('--repeat', default=3, help='Number of timing repeats')
+def main(states, inputs, repeat):
+    wep, base_input = synthetic_wep(states)
+    flow_inputs = []
+    for i in range(inputs):
+        flow_input = copy.deepcopy(base_input)
+        flow_input['input']['t0_source_path'] = f'/input/run_{i}.txt'
+        flow_inputs.append(flow_input)
+
+    def _loop():
+        for flow_input in flow_inputs:
+            parse_states(wep, flow_input)
+
+    def _plan():
+        plan = compile_wep(wep)
+        for batch in range(0, inputs, 100):
+            plan.bind_many(flow_inputs[batch:batch + 100])
+
+    # Best of alternating repeats, results are discarded as they are produced
+    timings = {_loop: [], _plan: []}
+    for _ in range(repeat):
+        for func, times in timings.items():
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    loop, bound = min(timings[_loop]), min(timings[_plan])
+
+    plan = compile_wep(wep)
+    assert plan.bind_many(flow_inputs[:10]) == [parse_states(wep, flow_input) for flow_input in flow_inputs[:10]]
+    print(f'{states} states x {inputs} inputs')
+    print(f'parse_states loop: {loop:8.3f}s')
+    print(f'  plan.bind_many: {bound:8.3f}s')
+    print(f'         speedup: {loop / bound:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmark: peak memory of writing a prospective crate from a large WEP, list-based vs streamed.
+
+Usage: python benchmarks/bench_wep_streaming.py [--states 10000 --states 100000]
+"""
+import tempfile
+from pathlib import Path
+
+import click
+from util import measure, synthetic_wep
+
+from lp_sdk.parser import prospective
+
+
+@click.command()
+@click.option('--states', multiple=True, type=int, default=[10000, 30000, 100000], help='Number of WEP states')
+def main(states):
+    print(f'{"states":>8} {"mode":>7} {"time (s)":>9} {"peak (MiB)":>11}')
+    for n_states in states:
+        wep, _ = synthetic_wep(n_states)
+        results = {}
+        with tempfile.TemporaryDirectory() as d:
+            with measure(results, 'list'):
+                data = prospective.parse_wep_to_rocrate(wep)
+                assert prospective.validate_rocrate(data)
+                prospective.write_rocrate(data, Path(d) / 'list.json')
+                del data
+
+            with measure(results, 'stream'):
+                data = prospective.stream_wep_to_rocrate(wep)
+                data['@graph'] = prospective.iter_validated(data['@graph'])
+                prospective.write_rocrate(data, Path(d) / 'stream.json')
+
+            assert (Path(d) / 'list.json').read_text() == (Path(d) / 'stream.json').read_text()
+
+        for mode, (elapsed, peak) in results.items():
+            print(f'{n_states:>8} {mode:>7} {elapsed:>9.3f} {peak / 2 ** 20:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
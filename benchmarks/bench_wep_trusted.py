@@ -0,0 +1,45 @@
+"""
+Benchmark: parse_states on large WEPs, with pydantic validation vs trusted models (constructed without validation).
+
+Usage: python benchmarks/bench_wep_trusted.py [--states 10000 --states 50000] [--repeat 3]
+"""
+import time
+from functools import partial
+
+import click
+from util import synthetic_wep
+
+from lp_sdk.parser.wep_parsing import compile_wep, parse_states
+
+
+def _best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option('--states', multiple=True, type=int, default=[10000, 50000], help='Number of WEP states')
+@click.option('--repeat', default=3, help='Number of timing repeats')
+def main(states, repeat):
+    print(f'{"states":>8} {"validated (s)":>14} {"trusted (s)":>12} {"bind only, validated/trusted (s)":>34}')
+    for n_states in states:
+        wep, flow_input = synthetic_wep(n_states)
+        assert parse_states(wep, flow_input, trusted=True) == parse_states(wep, flow_input)
+
+        validated = _best_of(repeat, partial(parse_states, wep, flow_input))
+        trusted = _best_of(repeat, partial(parse_states, wep, flow_input, trusted=True))
+
+        # Excluding the cost of compiling the WEP
+        plan = compile_wep(wep)
+        bind_validated = _best_of(repeat, partial(plan.bind_many, [flow_input]))
+        bind_trusted = _best_of(repeat, partial(plan.bind_many, [flow_input], trusted=True))
+
+        print(f'{n_states:>8} {validated:>14.3f} {trusted:>12.3f} {bind_validated:>18.3f} / {bind_trusted:.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Shared helpers for generating synthetic benchmark data"""
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TRANSFER_URL = 'https://transfer.actions.globus.org/transfer/'
+COMPUTE_URL = 'https://compute.actions.globus.org'
+
+
+def synthetic_wep(n_states: int) -> tuple[dict, dict]:
+    """
+    Build a linear Globus flow of n_states alternating transfer/compute states, and a matching input document.
+    Mirrors the structure of tests/data/globus_prov.
+    """
+    states = {}
+    flow_input = {'compute_endpoint': 'compute-ep', 'orch_endpoint': 'orch-ep', 'compute_gcs': 'compute-gcs'}
+    names = [f'Transfer{i // 2}' if i % 2 == 0 else f'Compute{i // 2}' for i in range(n_states)]
+
+    for i, name in enumerate(names):
+        j = i // 2
+        if i % 2 == 0:
+            state = {
+                'Comment': 'Transfer a file or directory in Globus',
+                'Type': 'Action',
+                'ActionUrl': TRANSFER_URL,
+                'Parameters': {
+                    'source_endpoint.$': '$.input.orch_endpoint',
+                    'destination_endpoint.$': '$.input.compute_gcs',
+                    'transfer_items': [{
+                        'source_path.$': f'$.input.t{j}_source_path',
+                        'destination_path.$': f'$.input.t{j}_destination_path',
+                        'recursive.$': f'$.input.t{j}_recursive',
+                    }]
+                },
+                'ResultPath': f'$.{name}',
+                'WaitTime': 600,
+            }
+            flow_input[f't{j}_source_path'] = f'/input/{j}.txt'
+            flow_input[f't{j}_destination_path'] = f'/step{j}/input/{j}.txt'
+            flow_input[f't{j}_recursive'] = False
+        else:
+            state = {
+                'Comment': None,
+                'Type': 'Action',
+                'ActionUrl': COMPUTE_URL,
+                'ExceptionOnActionFailure': False,
+                'Parameters': {
+                    'tasks': [{
+                        'endpoint.$': '$.input.compute_endpoint',
+                        'function.$': f'$.input.c{j}_function_id',
+                        'payload.$': f'$.input.{name}',
+                    }]
+                },
+                'ResultPath': f'$.{name}',
+                'WaitTime': 300,
+            }
+            flow_input[f'c{j}_function_id'] = f'function-{j}'
+            flow_input[name] = {'input_file': f'/step{j}/input/{j}.txt', 'output_file': f'/step{j}/output/{j}.txt'}
+
+        if i + 1 < n_states:
+            state['Next'] = names[i + 1]
+        else:
+            state['End'] = True
+        states[name] = state
+
+    wep = {'Comment': f'Synthetic flow with {n_states} states', 'StartAt': names[0], 'States': states}
+    return wep, {'input': flow_input}
+
+
+@contextmanager
+def measure(results: dict, name: str):
+    """Record elapsed time and peak traced memory of the enclosed block into results[name]"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = (elapsed, peak)
@@ -1,10 +1,21 @@
-from .provenance_tool import ProvenanceBaseTool
-from .provenance_client import ProvenanceBaseClient
-from .provenance_transfers import DistCrateTransfer
+import importlib
+
+# The tools/clients pull in gladier (and globus), which are slow to import, so they are only loaded on first access
+_lazy_imports = {
+    'ProvenanceBaseTool': '.provenance_tool',
+    'ProvenanceBaseClient': '.provenance_client',
+    'DistCrateTransfer': '.provenance_transfers',
+}
+
+
+def __getattr__(name):
+    if name in _lazy_imports:
+        return getattr(importlib.import_module(_lazy_imports[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 __all__ = [
     'ProvenanceBaseTool',
     'ProvenanceBaseClient',
     'DistCrateTransfer',
-]
\ No newline at end of file
+]
@@ -1,9 +1,15 @@
+import glob
+import itertools
+import sys
+import time
+from contextlib import nullcontext
 from pathlib import Path
 
 import click
 import pathlib
 
-from lp_sdk.parser.crate import get_crates
+from lp_sdk.parser.crate import CrateView, get_crates
+from lp_sdk.parser.index import INDEX_FILE, CrateIndex
 from lp_sdk.parser import prospective as _prospective
 
 
@@ -12,39 +18,177 @@ def cli():
     pass
 
 
+def _resolve_weps(input_path: str) -> list[Path]:
+    """Expand a WEP file, directory of WEPs (*.json), or glob pattern"""
+    path = Path(input_path)
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        return sorted(path.glob('*.json'))
+    return sorted(Path(p) for p in glob.glob(input_path, recursive=True) if Path(p).is_file())
+
+
+def _glob_root(input_path: str) -> Path:
+    """The directory WEPs are resolved from: a directory input, or the leading part of a glob without wildcards"""
+    path = Path(input_path)
+    if path.is_dir():
+        return path
+    parts = itertools.takewhile(lambda part: not glob.has_magic(part), path.parts)
+    return Path(*parts)
+
+
+def _convert_wep(args: tuple[Path, Path, bool]) -> tuple[str, int, float, str | None]:
+    """Convert a single WEP for batch mode, returning (status, entity count, elapsed time, error)"""
+    input_path, output_path, compact = args
+    start = time.perf_counter()
+    try:
+        count = _prospective.convert_wep(input_path, output_path, compact=compact)
+    # Invalid or malformed WEPs (and inputs, or outputs, which load_wep/write_rocrate assert on)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError, AssertionError) as e:
+        return 'FAILED', 0, time.perf_counter() - start, f'{type(e).__name__}: {e}'
+    return 'OK', count, time.perf_counter() - start, None
+
+
 @cli.command()
-@click.option('-i', '--input', 'input_path',
-              type=click.Path(exists=True, file_okay=True, dir_okay=False, path_type=Path),
-              help='Input WEP')
+@click.option('-i', '--input', 'input_path', type=str, required=True,
+              help='Input WEP, directory of WEPs, or glob pattern (quoted) matching WEPs')
 @click.option('-o', '--output', 'output_path',
-              type=click.Path(exists=False, file_okay=True, dir_okay=False, path_type=Path),
-              help='Output ROCrate')
-def prospective(input_path, output_path):
+              type=click.Path(exists=False, path_type=Path), required=True,
+              help='Output ROCrate, or output directory when converting multiple WEPs')
+@click.option('--compact', is_flag=True, default=False, help='Write without indentation')
+@click.option('-j', '--jobs', type=int, default=1, help='Number of WEPs to convert in parallel (batch mode)')
+def prospective(input_path, output_path, compact, jobs):
     """
     Very basic example of crate generation from WEP - nothing here is correct, everything will change
     :param input_path:
     :param output_path:
+    :param compact:
+    :param jobs:
     :return:
     """
-    wep_json = _prospective.load_wep(input_path)
-    rocrate_json = _prospective.parse_wep_to_rocrate(wep_json)
-    assert _prospective.validate_rocrate(rocrate_json)
-    _prospective.write_rocrate(rocrate_json, output_path)
+    if Path(input_path).is_file():
+        _prospective.convert_wep(Path(input_path), output_path, compact=compact)
+        return
+
+    # Batch mode: one crate per WEP in output_path, at the WEP's path relative to the glob root, so that WEPs of the
+    # same name in different directories (e.g.: matched by **) don't collide
+    weps = _resolve_weps(input_path)
+    if not weps:
+        raise click.BadParameter(f'No WEPs found matching {input_path}', param_hint='--input')
+    root = _glob_root(input_path)
+    tasks = [(wep, output_path / wep.relative_to(root), compact) for wep in weps]
+    for _, wep_output, _ in tasks:
+        wep_output.parent.mkdir(parents=True, exist_ok=True)
+
+    # Imported here, as the process pool machinery is only needed for parallel batches
+    from concurrent.futures import ProcessPoolExecutor
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext() as pool:
+        results = pool.map(_convert_wep, tasks) if pool else map(_convert_wep, tasks)
+        for (wep, _, _), (status, count, elapsed, error) in zip(tasks, results):
+            print(f'{status:<6} {count:>8} entities {elapsed:>8.3f}s  {wep}' + (f'  {error}' if error else ''))
+            failed += status != 'OK'
+
+    print(f'{len(tasks) - failed} converted, {failed} failed')
+    if failed:
+        sys.exit(1)
+
+
+def _discovery_options(func):
+    """Options shared by commands which search a directory for crates"""
+    func = click.option('-j', '--jobs', type=int, default=None,
+                        help='Number of crates to load concurrently (default: based on CPU count)')(func)
+    func = click.option('--ignore', multiple=True,
+                        help='Glob of files/directories to skip, may be given multiple times')(func)
+    func = click.option('--sort/--no-sort', 'ordered', default=False,
+                        help='List crates sorted by path, rather than in discovery order')(func)
+    return func
 
 
 @cli.command()
 @click.argument('path', type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path))
-def list_subcrates(path):
+@_discovery_options
+def list_subcrates(path, jobs, ignore, ordered):
     # Find all ro-crate-metadata.json (by name)
-    for crate in get_crates(path):
+    for crate in get_crates(path, ignore=ignore, workers=jobs, ordered=ordered, loader=CrateView):
         print(crate.name)
 
 
 @cli.command()
 @click.argument('path', type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path))
-def list_outputs(path):
-    for crate in get_crates(path):
+@_discovery_options
+def list_outputs(path, jobs, ignore, ordered):
+    for crate in get_crates(path, ignore=ignore, workers=jobs, ordered=ordered, loader=CrateView):
         print(crate.name)
         for file in crate.get_by_type('File'):
-            if file.id.startswith('output/'):
-                print(f'  {file.id}')
+            if file['@id'].startswith('output/'):
+                print(f'  {file["@id"]}')
+
+
+def _index_path(path: pathlib.Path, db: pathlib.Path | None) -> pathlib.Path:
+    return db or path / INDEX_FILE
+
+
+@cli.command()
+@click.argument('path', type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path))
+@click.option('--db', type=click.Path(dir_okay=False, path_type=pathlib.Path),
+              help=f'Index database (default: PATH/{INDEX_FILE})')
+@click.option('-j', '--jobs', type=int, default=None,
+              help='Number of crates to parse concurrently (default: based on CPU count)')
+@click.option('--ignore', multiple=True,
+              help='Glob of files/directories to skip, may be given multiple times')
+def index(path, db, jobs, ignore):
+    """Create or incrementally update the crate index for PATH"""
+    with CrateIndex(_index_path(path, db)) as crate_index:
+        stats = crate_index.update(path, ignore=ignore, workers=jobs)
+    for crate_path, error in stats.errors:
+        print(f'FAILED {crate_path}  {error}', file=sys.stderr)
+    print(f'added: {stats.added}, updated: {stats.updated}, removed: {stats.removed}, unchanged: {stats.unchanged}, '
+          f'failed: {stats.failed}')
+
+
+@cli.group()
+def query():
+    """Query the crate index created by `lp-sdk index`"""
+
+
+def _query_options(func):
+    """Options shared by index query commands"""
+    func = click.option('--db', type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+                        help=f'Index database (default: PATH/{INDEX_FILE})')(func)
+    func = click.argument('path', type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path))(func)
+    return func
+
+
+@query.command('outputs')
+@_query_options
+def query_outputs(path, db):
+    """List output files of every indexed crate"""
+    with CrateIndex(_index_path(path, db)) as crate_index:
+        current = None
+        for crate_path, name, file_id in crate_index.outputs():
+            if crate_path != current:
+                print(name)
+                current = crate_path
+            print(f'  {file_id}')
+
+
+@query.command('entity')
+@_query_options
+@click.argument('entity_id')
+def query_entity(path, db, entity_id):
+    """List crates containing an entity with id ENTITY_ID"""
+    with CrateIndex(_index_path(path, db)) as crate_index:
+        for crate_path, name in crate_index.crates_with_entity(entity_id):
+            print(f'{name}\t{crate_path}')
+
+
+@query.command('type')
+@_query_options
+@click.argument('type_', metavar='TYPE')
+def query_type(path, db, type_):
+    """List crates whose mainEntity has @type TYPE"""
+    with CrateIndex(_index_path(path, db)) as crate_index:
+        for crate_path, name in crate_index.crates_of_type(type_):
+            print(f'{name}\t{crate_path}')
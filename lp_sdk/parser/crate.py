@@ -1,12 +1,144 @@
-from rocrate.rocrate import ROCrate
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from collections.abc import Callable, Iterable, Iterator
+import json
 import os
 import pathlib
 
+METADATA_FILE = 'ro-crate-metadata.json'
 
-def get_crates(path: pathlib.Path):
+
+class CrateView:
+    """
+    Lightweight, read-only view of a crate's metadata.
+
+    Parses ro-crate-metadata.json once into plain dicts indexed by @id and @type, without building rocrate entity
+    objects or checking data entities on disk. Intended for listing/querying many crates, use ROCrate for anything
+    that modifies or writes a crate.
+    """
+    def __init__(self, source: str):
+        self.source = pathlib.Path(source)
+        with open(self.source / METADATA_FILE) as f:
+            metadata = json.load(f)
+
+        self.entities = {}
+        self._types = defaultdict(list)
+        for entity in metadata.get('@graph', []):
+            self.entities[entity['@id']] = entity
+            types = entity.get('@type', [])
+            for t in [types] if isinstance(types, str) else types:
+                self._types[t].append(entity)
+
+        descriptor = self.entities.get(METADATA_FILE, {})
+        root_id = descriptor.get('about', {}).get('@id', './')
+        self.root_dataset = self.entities.get(root_id, {})
+
+    @property
+    def name(self):
+        return self.root_dataset.get('name')
+
+    def get(self, id: str, default=None) -> dict | None:
+        return self.entities.get(id, default)
+
+    def get_by_type(self, type: str) -> list[dict]:
+        return self._types.get(type, [])
+
+
+def _is_ignored(rel_path: str, name: str, ignore: Iterable[str]) -> bool:
+    """Check a path relative to the search root against a list of glob patterns"""
+    return any(fnmatch(name, pattern) or fnmatch(rel_path, pattern) for pattern in ignore)
+
+
+def find_crate_roots(path: pathlib.Path, ignore: Iterable[str] = (), prune: bool = True) -> Iterator[pathlib.Path]:
+    """
+    Find every directory below path (inclusive) which contains an ro-crate-metadata.json file.
+
+    Directories are visited depth first, in the order returned by os.scandir. When prune is set, the payload of a
+    crate (other than the search root itself, which may be a publication crate holding subcrates) is not searched.
+    Directories or files matching any of the ignore globs, either by name or by path relative to path, are skipped.
+    Symlinked directories are not followed.
+    """
+    assert path.is_dir(), f"Expecting directory, got {path}"
+    ignore = tuple(ignore)
+
+    stack = [(path, '')]
+    while stack:
+        directory, rel_dir = stack.pop()
+        subdirs = []
+        is_crate = False
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    rel_path = f'{rel_dir}{entry.name}'
+                    if ignore and _is_ignored(rel_path, entry.name, ignore):
+                        continue
+                    if entry.name == METADATA_FILE and entry.is_file():
+                        is_crate = True
+                    elif entry.is_dir(follow_symlinks=False):
+                        subdirs.append((pathlib.Path(entry.path), f'{rel_path}/'))
+        except PermissionError:
+            continue
+
+        if is_crate:
+            yield directory
+            if prune and directory != path:
+                continue
+
+        # Reversed, so that the stack pops subdirectories in scandir order
+        stack.extend(reversed(subdirs))
+
+
+def load_crates(roots: Iterable[pathlib.Path], workers: int | None = None,
+                loader: Callable[[str], object] | None = None) -> Iterator:
+    """
+    Lazily load the crates at each of roots, in order.
+
+    Crates are loaded with loader (default: rocrate's ROCrate) by a bounded thread pool of size workers (in the
+    calling thread if workers <= 1), with only a small window of crates loaded ahead of the consumer.
+    """
+    if loader is None:
+        # Imported here, as rocrate is slow to import and not needed by CrateView based commands
+        from rocrate.rocrate import ROCrate
+        loader = ROCrate
+
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+
+    if workers <= 1:
+        for root in roots:
+            yield loader(str(root))
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for root in roots:
+                pending.append(pool.submit(loader, str(root)))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Consumer stopped early (or a load failed), don't wait on crates that will not be used
+            for future in pending:
+                future.cancel()
+
+
+def get_crates(path: pathlib.Path, ignore: Iterable[str] = (), workers: int | None = None, ordered: bool = False,
+               prune: bool = True, loader: Callable[[str], object] | None = None):
+    """
+    Lazily load every crate found below path.
+
+    Crates are yielded in discovery order, or sorted by path if ordered is set. See find_crate_roots for ignore and
+    prune, and load_crates for workers.
+    """
     assert path.is_dir(), f"Expecting directory, got {path}"
     assert path.exists(), f"Directory does not exist: {path}"
 
-    for root, dir, files in os.walk(path):
-        if 'ro-crate-metadata.json' in files:
-            yield ROCrate(str(pathlib.Path(root)))
+    roots = find_crate_roots(path, ignore=ignore, prune=prune)
+    if ordered:
+        roots = iter(sorted(roots))
+
+    yield from load_crates(roots, workers=workers, loader=loader)
@@ -0,0 +1,164 @@
+from collections import defaultdict
+
+from lp_sdk.parser.wep_parsing import (
+    ComputeState,
+    InputValue,
+    TransferState,
+    parse_states,
+)
+
+
+def _value(field):
+    """The value of a state field, which is either a literal from the WEP, or looked up from the input"""
+    return field.value if isinstance(field, InputValue) else field
+
+
+class _ParameterIndex:
+    """
+    Formal parameters of a flow's compute functions, with a hash index from value (e.g.: a path) to parameter names.
+    Values need not be unique, a path shared by several parameters maps to all of them, in step order.
+    """
+    def __init__(self, compute_states: list[ComputeState]):
+        self.params = {}
+        self._by_value = defaultdict(list)
+
+        for state in compute_states:
+            for task in state.tasks:
+                if not isinstance(task.payload, InputValue) or not isinstance(task.payload.value, dict):
+                    raise TypeError(f'Expecting payload of {state.name} to be a dict of kwargs to the function')
+                for key, value in task.payload.value.items():
+                    name = f'{task.payload.key}.{key}'
+                    self.params[name] = {'step': state.name, 'name': name, 'value': value}
+                    try:
+                        self._by_value[value].append(name)
+                    except TypeError:
+                        pass  # Unhashable values (lists, dicts) can't be paths
+
+    def matching(self, path: str) -> list[str]:
+        """Names of the parameters with value path, raising ValueError if there are none"""
+        names = self._by_value.get(path)
+        if not names:
+            raise ValueError(f'No parameter found matching path {path}')
+        return names
+
+    def files(self, path: str) -> list[str]:
+        """Names of the file parameters with value path"""
+        return [name for name in self._by_value.get(path, []) if self.params[name]['additionalType'] == 'File']
+
+
+def parse_globus_wep(wep: dict, input_: dict, orch_epid: str,
+                     states: tuple[list[ComputeState], list[TransferState]] | None = None) -> tuple[dict, dict]:
+    """
+    Parse a Globus WEP and its input into the step info and parameter links used by LpProvCrate.build_from_wep, e.g.:
+    crate.build_from_wep(wep_file, partial(parse_globus_wep, input_=input_, orch_epid=orch_epid))
+
+    Function parameters sent to/from a compute endpoint by a transfer are files (inputs/outputs of the step), all other
+    parameters are direct inputs, passed from the workflow (main). Transfers to/from the orchestration endpoint (
+    orch_epid) become workflow inputs/outputs. Paths are matched to parameters via a hash index, so parsing is linear
+    in the number of parameters and transfer items. A path shared by several parameters is linked to each of them.
+    Already parsed states (see parse_states) may be passed to avoid re-parsing.
+    """
+    compute_states, transfer_states = states if states is not None else parse_states(wep, input_)
+    index = _ParameterIndex(compute_states)
+    formal_params = index.params
+    positions = {state.name: state.position for state in compute_states}
+
+    def _step_pos(name: str) -> int:
+        return positions[formal_params[name]['step']]
+
+    # Use transfer states to identify which parameters are inputs/outputs (and that they are files)
+    for transfer in transfer_states:
+        for transfer_item in transfer.transfer_items:
+            sources, destinations = [], []
+            if _value(transfer.source_endpoint) != orch_epid:
+                sources = index.matching(_value(transfer_item.source_path))
+            if _value(transfer.destination_endpoint) != orch_epid:
+                destinations = index.matching(_value(transfer_item.destination_path))
+            if sources and destinations:
+                # Where paths are shared, only a parameter of an earlier step is the source for one of a later step
+                pairs = [(s, d) for s in sources for d in destinations if _step_pos(s) < _step_pos(d)]
+                sources = list(dict.fromkeys(s for s, _ in pairs))
+                destinations = list(dict.fromkeys(d for _, d in pairs))
+            for name in sources:
+                formal_params[name]['additionalType'] = 'File'
+                formal_params[name]['output'] = True
+            for name in destinations:
+                formal_params[name]['additionalType'] = 'File'
+                formal_params[name]['input'] = True
+
+    # Any other parameter must be a direct input to the function
+    # TODO: consider passing of data from one func to another via ResultPath
+    for param in formal_params.values():
+        if 'additionalType' not in param:
+            param['additionalType'] = type(param['value']).__name__
+            param['input'] = True
+
+    # Parameter connections
+    orch_params = {}  # Additional parameters at the 'main' level
+    param_links = []
+
+    # Use transfers to create parameter connections for files
+    for transfer in transfer_states:
+        for transfer_item in transfer.transfer_items:
+            if _value(transfer.source_endpoint) == orch_epid:
+                # Transfer from orchestration endpoint
+                for dest_key in index.files(_value(transfer_item.destination_path)):
+                    source_key = f'main#{dest_key}'
+                    orch_params[source_key] = {
+                        'name': source_key,
+                        'value': _value(transfer_item.source_path),
+                        'additionalType': 'File',
+                        'input': True,
+                    }
+                    param_links.append((source_key, dest_key))
+            elif _value(transfer.destination_endpoint) == orch_epid:
+                # Transfer to orchestration endpoint
+                for source_key in index.files(_value(transfer_item.source_path)):
+                    dest_key = f'main#{source_key}'
+                    orch_params[dest_key] = {
+                        'name': dest_key,
+                        'value': _value(transfer_item.destination_path),
+                        'additionalType': 'File',
+                        'output': True,
+                    }
+                    param_links.append((source_key, dest_key))
+            else:
+                # Where paths are shared, only link a parameter to those of later steps
+                param_links.extend(
+                    (source_key, dest_key)
+                    for source_key in index.files(_value(transfer_item.source_path))
+                    for dest_key in index.files(_value(transfer_item.destination_path))
+                    if _step_pos(source_key) < _step_pos(dest_key)
+                )
+
+    # Non-file parameters are also inputs to main
+    for key, param in formal_params.items():
+        if param['additionalType'] != 'File':
+            orch_params[f'main#{key}'] = param
+            param_links.append((f'main#{key}', key))
+
+    # Assemble step info, grouping parameters by step in a single pass
+    step_info = {
+        'main': {
+            'input': [k for k, v in orch_params.items() if v.get('input')],
+            'output': [k for k, v in orch_params.items() if v.get('output')],
+        }
+    }
+    for step in compute_states:
+        step_info[step.name] = {'pos': str(step.position), 'input': [], 'output': []}
+    for key, param in formal_params.items():
+        info = step_info[param['step']]
+        if param.get('input'):
+            info['input'].append(key)
+        if param.get('output'):
+            info['output'].append(key)
+
+    # Assemble param links
+    param_links_by_step = defaultdict(list)
+    for source, target in param_links:
+        if target in orch_params:
+            param_links_by_step['main'].append((source, target))
+        else:
+            param_links_by_step[formal_params[target]['step']].append((source, target))
+
+    return step_info, param_links_by_step
@@ -0,0 +1,188 @@
+import os
+import pathlib
+import sqlite3
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from lp_sdk.parser.crate import METADATA_FILE, CrateView, find_crate_roots, load_crates
+
+INDEX_FILE = '.lp-sdk-index.sqlite'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS crates (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    name TEXT,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    crate_id INTEGER NOT NULL REFERENCES crates(id) ON DELETE CASCADE,
+    entity_id TEXT NOT NULL,
+    type TEXT
+);
+CREATE TABLE IF NOT EXISTS crate_types (
+    crate_id INTEGER NOT NULL REFERENCES crates(id) ON DELETE CASCADE,
+    type TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    crate_id INTEGER NOT NULL REFERENCES crates(id) ON DELETE CASCADE,
+    entity_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entities_entity_id ON entities(entity_id);
+CREATE INDEX IF NOT EXISTS entities_type ON entities(type);
+CREATE INDEX IF NOT EXISTS entities_crate_id ON entities(crate_id);
+CREATE INDEX IF NOT EXISTS crate_types_type ON crate_types(type);
+CREATE INDEX IF NOT EXISTS crate_types_crate_id ON crate_types(crate_id);
+CREATE INDEX IF NOT EXISTS files_entity_id ON files(entity_id);
+CREATE INDEX IF NOT EXISTS files_crate_id ON files(crate_id);
+'''
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _is_local(entity_id: str) -> bool:
+    """Check if an entity id refers to a path within the crate, rather than a url or local identifier"""
+    return not entity_id.startswith('#') and '://' not in entity_id
+
+
+@dataclass
+class IndexStats:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    # Crates whose metadata could not be read or parsed, which are left out of the index
+    failed: int = 0
+    errors: list[tuple[str, str]] = field(default_factory=list)
+
+
+def _load_crate(root: str) -> CrateView | Exception:
+    """CrateView of the crate at root, or the error if its metadata can't be read or parsed"""
+    try:
+        return CrateView(root)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        return e
+
+
+class CrateIndex:
+    """
+    Persistent SQLite index of the crates found below a directory.
+
+    Stores the id and type(s) of every entity, the local path of every File/Dataset, and the types of each crate's
+    mainEntity. Crates are only re-parsed when the mtime or size of their metadata file changes. Crates which can't be
+    parsed are skipped, and reported in the IndexStats of update.
+    """
+    def __init__(self, db_path: str | pathlib.Path):
+        self.db_path = pathlib.Path(db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def update(self, root: pathlib.Path, ignore: Iterable[str] = (), workers: int | None = None) -> IndexStats:
+        """Bring the index up to date with the crates currently found below root"""
+        assert root.is_dir(), f"Expecting directory, got {root}"
+        root = root.resolve()
+        stats = IndexStats()
+
+        # Existing crates under this root
+        prefix = f'{root}{os.sep}'
+        known = {
+            path: (crate_id, mtime_ns, size)
+            for crate_id, path, mtime_ns, size in self.conn.execute(
+                'SELECT id, path, mtime_ns, size FROM crates WHERE path = ? OR substr(path, 1, ?) = ?',
+                (str(root), len(prefix), prefix))
+        }
+
+        changed = []
+        for crate_root in find_crate_roots(root, ignore=ignore):
+            st = (crate_root / METADATA_FILE).stat()
+            entry = known.pop(str(crate_root), None)
+            if entry is not None and entry[1:] == (st.st_mtime_ns, st.st_size):
+                stats.unchanged += 1
+                continue
+            changed.append((crate_root, st, entry))
+
+        with self.conn:
+            # Crates that have been removed from disk
+            for crate_id, _, _ in known.values():
+                self.conn.execute('DELETE FROM crates WHERE id = ?', (crate_id,))
+                stats.removed += 1
+
+            crates = load_crates([crate_root for crate_root, _, _ in changed], workers=workers, loader=_load_crate)
+            for (crate_root, st, entry), crate in zip(changed, crates):
+                if entry is not None:
+                    # Also when it can no longer be parsed, rather than keep stale entries
+                    self.conn.execute('DELETE FROM crates WHERE id = ?', (entry[0],))
+                if isinstance(crate, Exception):
+                    # Not recorded, so it is parsed again on the next update
+                    stats.failed += 1
+                    stats.errors.append((str(crate_root), f'{type(crate).__name__}: {crate}'))
+                    continue
+                if entry is not None:
+                    stats.updated += 1
+                else:
+                    stats.added += 1
+                self._insert(crate, st)
+
+        return stats
+
+    def _insert(self, crate: CrateView, st: os.stat_result):
+        cur = self.conn.execute('INSERT INTO crates (path, name, mtime_ns, size) VALUES (?, ?, ?, ?)',
+                                (str(crate.source), crate.name, st.st_mtime_ns, st.st_size))
+        crate_id = cur.lastrowid
+
+        entities = []
+        files = []
+        for entity_id, entity in crate.entities.items():
+            types = _as_list(entity.get('@type')) or [None]
+            entities.extend((crate_id, entity_id, t) for t in types)
+            for t in types:
+                if t in ('File', 'Dataset') and _is_local(entity_id):
+                    files.append((crate_id, entity_id, t, os.path.normpath(crate.source / entity_id)))
+
+        crate_types = [
+            (crate_id, t)
+            for ref in _as_list(crate.root_dataset.get('mainEntity'))
+            for t in _as_list(crate.get(ref.get('@id'), {}).get('@type'))
+        ]
+
+        self.conn.executemany('INSERT INTO entities (crate_id, entity_id, type) VALUES (?, ?, ?)', entities)
+        self.conn.executemany('INSERT INTO files (crate_id, entity_id, type, path) VALUES (?, ?, ?, ?)', files)
+        self.conn.executemany('INSERT INTO crate_types (crate_id, type) VALUES (?, ?)', crate_types)
+
+    def outputs(self) -> list[tuple[str, str, str]]:
+        """(crate path, crate name, file id) of every File with an id under output/"""
+        return self.conn.execute(
+            "SELECT c.path, c.name, f.entity_id FROM files f JOIN crates c ON c.id = f.crate_id "
+            "WHERE f.type = 'File' AND substr(f.entity_id, 1, 7) = 'output/' ORDER BY c.path, f.entity_id"
+        ).fetchall()
+
+    def crates_with_entity(self, entity_id: str) -> list[tuple[str, str]]:
+        """(crate path, crate name) of every crate containing an entity with the given @id"""
+        return self.conn.execute(
+            'SELECT DISTINCT c.path, c.name FROM entities e JOIN crates c ON c.id = e.crate_id '
+            'WHERE e.entity_id = ? ORDER BY c.path', (entity_id,)
+        ).fetchall()
+
+    def crates_of_type(self, type: str) -> list[tuple[str, str]]:
+        """(crate path, crate name) of every crate whose mainEntity has the given @type"""
+        return self.conn.execute(
+            'SELECT DISTINCT c.path, c.name FROM crate_types t JOIN crates c ON c.id = t.crate_id '
+            'WHERE t.type = ? ORDER BY c.path', (type,)
+        ).fetchall()
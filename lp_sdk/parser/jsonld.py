@@ -0,0 +1,66 @@
+import json
+import os
+import uuid
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, TextIO
+
+DEFAULT_CONTEXT = 'https://w3id.org/ro/crate/1.1/context'
+# Namespace of the ids given by content_id
+ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'https://w3id.org/ro/crate')
+
+
+def content_id(content: Any) -> str:
+    """A UUID (version 5) derived from JSON serializable content, so equal content always gives the same id"""
+    return str(uuid.uuid5(ID_NAMESPACE, json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)))
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """
+    A temporary path alongside path, to write to within the block, which is moved into place once the block completes.
+    Readers (e.g.: other processes) never see a partially written file. The temporary file is removed on error.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _write_graph(f: TextIO, context: Any, graph: Iterable[dict], compact: bool):
+    """Write the crate document, encoding one @graph item at a time"""
+    if compact:
+        f.write(f'{{"@context":{json.dumps(context, separators=(",", ":"))},"@graph":[')
+        sep = '\n'
+        for item in graph:
+            f.write(sep)
+            f.write(json.dumps(item, separators=(',', ':')))
+            sep = ',\n'
+        f.write('\n]}' if sep != '\n' else ']}')
+        return
+
+    # Matches the output of json.dump(data, indent=2)
+    f.write(f'{{\n  "@context": {json.dumps(context, indent=2).replace(chr(10), chr(10) + "  ")},\n  "@graph": [')
+    sep = '\n    '
+    for item in graph:
+        f.write(sep)
+        f.write(json.dumps(item, indent=2).replace('\n', '\n    '))
+        sep = ',\n    '
+    f.write('\n  ]\n}' if sep != '\n    ' else ']\n}')
+
+
+def write_jsonld(path: Path, graph: Iterable[dict], context: Any = DEFAULT_CONTEXT, compact: bool = False):
+    """
+    Stream a JSON-LD crate document to path.
+
+    graph may be any iterable (e.g.: a generator), items are encoded and written one at a time so the full document is
+    never held in memory. Compact output has no indentation, with one @graph item per line. The document is written
+    atomically, see atomic_path.
+    """
+    with atomic_path(path) as tmp_path, open(tmp_path, 'x') as f:
+        _write_graph(f, context, graph, compact)
@@ -0,0 +1,180 @@
+import json
+import mmap
+import re
+from collections.abc import Iterable
+from pathlib import Path
+
+from lp_sdk.parser.wep_parsing import (
+    ComputeState,
+    TransferState,
+    compile_path,
+    compile_wep,
+)
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+# Strings as runs of plain characters between escapes, which can't backtrack (and doesn't need possessive
+# quantifiers, which are Python 3.11+)
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# Strings are matched whole, so brackets inside them are not counted
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]', re.DOTALL)
+_SCALAR = re.compile(rb'[^,:\[\]{}\s]+')
+_OPEN = frozenset(b'[{')
+
+
+class JsonScanError(ValueError):
+    """The input document is not valid JSON, at a point the scan had to read"""
+    def __init__(self, message: str, pos: int):
+        super().__init__(f'{message} at offset {pos}')
+        self.pos = pos
+
+
+def _path_trie(paths: Iterable[str]) -> dict | bool:
+    """
+    Merge JSONPaths into a trie of segments, where True marks a value needed whole. Paths within a value that is needed
+    whole are dropped, and the root path ($) makes the whole document needed.
+    """
+    trie = {}
+    for path in paths:
+        segments = compile_path(path).segments
+        if not segments:
+            return True
+        node = trie
+        for segment in segments[:-1]:
+            child = node.setdefault(segment, {})
+            if child is True:
+                break
+            node = child
+        else:
+            node[segments[-1]] = True
+    return trie
+
+
+class _Scanner:
+    """Walks a JSON document in a buffer (bytes or mmap), decoding only the values selected by a path trie"""
+    def __init__(self, buf):
+        self.buf = buf
+
+    def _ws(self, pos: int) -> int:
+        return _WHITESPACE.match(self.buf, pos).end()
+
+    def _expect(self, pos: int, char: bytes) -> int:
+        if self.buf[pos:pos + 1] != char:
+            raise JsonScanError(f'Expected {char.decode()!r}', pos)
+        return self._ws(pos + 1)
+
+    def _key(self, pos: int) -> tuple[str, int]:
+        match = _STRING.match(self.buf, pos)
+        if match is None:
+            raise JsonScanError('Expected object key', pos)
+        raw = match.group()
+        key = json.loads(raw) if b'\\' in raw else raw[1:-1].decode()
+        return key, self._expect(self._ws(match.end()), b':')
+
+    def skip(self, pos: int) -> int:
+        """End of the value starting at pos, without decoding it (only brackets and strings are checked)"""
+        buf = self.buf
+        char = buf[pos:pos + 1]
+        if char == b'"':
+            match = _STRING.match(buf, pos)
+        elif char and char[0] in _OPEN:
+            depth = 0
+            for match in _TOKEN.finditer(buf, pos):
+                token = buf[match.start()]
+                if token in _OPEN:
+                    depth += 1
+                elif token != ord('"'):
+                    depth -= 1
+                    if depth == 0:
+                        return match.end()
+            raise JsonScanError('Unterminated array or object', pos)
+        else:
+            match = _SCALAR.match(buf, pos)
+        if match is None:
+            raise JsonScanError('Expected value', pos)
+        return match.end()
+
+    def decode(self, pos: int) -> tuple[object, int]:
+        end = self.skip(pos)
+        try:
+            return json.loads(self.buf[pos:end]), end
+        except json.JSONDecodeError as e:
+            raise JsonScanError(e.msg, pos + e.pos) from None
+
+    def select(self, pos: int, trie: dict | bool) -> tuple[object, int]:
+        """
+        The value starting at pos, pruned to the paths in trie, and its end. Selected array items are returned as a
+        dict of index to item.
+        """
+        if trie is True:
+            return self.decode(pos)
+
+        char = self.buf[pos:pos + 1]
+        if char == b'{':
+            result = {}
+            pos = self._ws(pos + 1)
+            if self.buf[pos:pos + 1] == b'}':
+                return result, pos + 1
+            while True:
+                key, pos = self._key(pos)
+                subtrie = trie.get(key)
+                if subtrie is None:
+                    pos = self.skip(pos)
+                else:
+                    result[key], pos = self.select(pos, subtrie)
+                pos = self._ws(pos)
+                if self.buf[pos:pos + 1] == b'}':
+                    return result, pos + 1
+                pos = self._expect(pos, b',')
+        elif char == b'[':
+            result = {}
+            pos = self._ws(pos + 1)
+            if self.buf[pos:pos + 1] == b']':
+                return result, pos + 1
+            index = 0
+            while True:
+                subtrie = trie.get(index)
+                if subtrie is None:
+                    pos = self.skip(pos)
+                else:
+                    result[index], pos = self.select(pos, subtrie)
+                pos = self._ws(pos)
+                if self.buf[pos:pos + 1] == b']':
+                    return result, pos + 1
+                pos = self._expect(pos, b',')
+                index += 1
+
+        # A scalar where the paths expect a container, kept so that lookups fail as they would on the full document
+        return self.decode(pos)
+
+
+def select_json(buf, paths: Iterable[str]) -> object:
+    """
+    Decode a JSON document (bytes or mmap) pruned to the subtrees referenced by JSONPaths. Other subtrees are skipped
+    over without being decoded, and selected array items are returned as a dict of index to item.
+    """
+    scanner = _Scanner(buf)
+    pos = scanner._ws(0)
+    value, pos = scanner.select(pos, _path_trie(paths))
+    pos = scanner._ws(pos)
+    if pos != len(buf):
+        raise JsonScanError('Extra data', pos)
+    return value
+
+
+def load_input(path: Path, paths: Iterable[str]) -> dict:
+    """
+    Load a flow input file, decoding only the subtrees referenced by JSONPaths (e.g.: WepPlan.paths). The file is
+    memory mapped, so large unreferenced values are never read into memory.
+    """
+    with open(path, 'rb') as f:
+        if not f.seek(0, 2):
+            raise JsonScanError('Empty input document', 0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return select_json(buf, paths)
+
+
+def parse_states_from_file(wep: dict, input_path: Path,
+                           trusted: bool = False) -> tuple[list[ComputeState], list[TransferState]]:
+    """As parse_states, but lazily loading only the parts of the input file the WEP references"""
+    plan = compile_wep(wep)
+    return plan.bind(load_input(input_path, plan.paths), trusted)
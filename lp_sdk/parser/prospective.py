@@ -1,6 +1,10 @@
 import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 
+from lp_sdk.parser.jsonld import write_jsonld
+
 
 def load_wep(path: Path) -> dict:
     assert path.is_file(), f"Input file {path} does not exist"
@@ -10,15 +14,10 @@ def load_wep(path: Path) -> dict:
     return data
 
 
-def parse_wep_to_rocrate(wep: dict) -> dict:
-    # Not sure where these come from, yet:
-    basics = {
-        '@context': 'https://w3id.org/ro/crate/1.1/context',
-        '@graph': []
-    }
-
+def iter_wep_graph(wep: dict) -> Iterator[dict]:
+    """Yield the @graph items for a WEP, one per state"""
     for key, value in wep['States'].items():
-        item = {
+        yield {
             '@id': key,
             '@type': ["File", "SoftwareSourceCode", "ComputationalWorkflow", "HowTo"],
             'input': [
@@ -30,34 +29,157 @@ def parse_wep_to_rocrate(wep: dict) -> dict:
             ]
         }
 
-        basics['@graph'].append(item)
+
+def parse_wep_to_rocrate(wep: dict) -> dict:
+    # Not sure where these come from, yet:
+    basics = {
+        '@context': 'https://w3id.org/ro/crate/1.1/context',
+        '@graph': list(iter_wep_graph(wep))
+    }
 
     return basics
 
 
-def validate_rocrate(data: dict) -> bool:
-    expected_fields = [
-        '@context',
-        '@graph',
-    ]
+def stream_wep_to_rocrate(wep: dict) -> dict:
+    """As parse_wep_to_rocrate, but @graph is a generator, for piping through iter_validated into write_rocrate"""
+    return {
+        '@context': 'https://w3id.org/ro/crate/1.1/context',
+        '@graph': iter_wep_graph(wep)
+    }
+
 
-    # todo: return false rather than error
-    assert all([field in data for field in expected_fields])
+@dataclass
+class ValidationProblem:
+    """A single problem found in a crate. index is the position in @graph, or None for top-level problems"""
+    message: str
+    index: int | None = None
+    id: str | None = None
 
-    expected_graph_fields = [
-        '@id', '@type'
-    ]
-    for item in data['@graph']:
-        assert all([field in item for field in expected_graph_fields])
+    def __str__(self):
+        if self.index is None:
+            return self.message
+        return f'@graph[{self.index}] ({self.id}): {self.message}'
 
-    return True
 
+@dataclass
+class ValidationReport:
+    """Result of validate_rocrate, truthy if no problems were found"""
+    problems: list[ValidationProblem] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return not self.problems
+
+    def __bool__(self):
+        return self.valid
+
+    def __str__(self):
+        return '\n'.join(str(p) for p in self.problems) or 'valid'
 
-def write_rocrate(data: dict, path: Path) -> bool:
+
+class _GraphChecker:
+    """Checks @graph items one at a time, remembering ids to detect duplicates"""
+    expected_graph_fields = (
+        '@id', '@type'
+    )
+
+    def __init__(self):
+        self.seen_ids = {}
+        self.index = 0
+
+    def check(self, item) -> list[ValidationProblem]:
+        index = self.index
+        self.index += 1
+
+        if not isinstance(item, dict):
+            return [ValidationProblem(f'item is {type(item).__name__}, expected dict', index)]
+
+        item_id = item.get('@id')
+        problems = [
+            ValidationProblem(f'missing {key}', index, item_id)
+            for key in self.expected_graph_fields if key not in item
+        ]
+
+        if '@id' in item:
+            if not isinstance(item_id, str):
+                problems.append(ValidationProblem(f'@id is {type(item_id).__name__}, expected str', index))
+            elif item_id in self.seen_ids:
+                problems.append(ValidationProblem(f'duplicate @id, first seen at @graph[{self.seen_ids[item_id]}]',
+                                                  index, item_id))
+            else:
+                self.seen_ids[item_id] = index
+
+        if '@type' in item and not isinstance(item['@type'], (str, list)):
+            problems.append(ValidationProblem(f'@type is {type(item["@type"]).__name__}, expected str or list',
+                                              index, item_id))
+
+        return problems
+
+
+def validate_rocrate(data: dict) -> ValidationReport:
+    """
+    Check a crate in a single pass, reporting every item missing @id/@type, duplicate @ids and malformed top-level
+    fields. @graph may be any iterable of items, such as the generator of stream_wep_to_rocrate, which is consumed.
+    Never raises on invalid data.
+    """
+    report = ValidationReport()
+
+    if not isinstance(data, dict):
+        report.problems.append(ValidationProblem(f'crate is {type(data).__name__}, expected dict'))
+        return report
+
+    if '@context' not in data:
+        report.problems.append(ValidationProblem('missing @context'))
+    elif not isinstance(data['@context'], (str, dict, list)):
+        report.problems.append(ValidationProblem(f'@context is {type(data["@context"]).__name__}, '
+                                                 f'expected str, dict or list'))
+
+    if '@graph' not in data:
+        report.problems.append(ValidationProblem('missing @graph'))
+    elif not isinstance(data['@graph'], Iterable) or isinstance(data['@graph'], (str, bytes, dict)):
+        report.problems.append(ValidationProblem(f'@graph is {type(data["@graph"]).__name__}, expected list'))
+    else:
+        checker = _GraphChecker()
+        for item in data['@graph']:
+            report.problems.extend(checker.check(item))
+
+    return report
+
+
+def iter_validated(items: Iterable[dict]) -> Iterator[dict]:
+    """Validate @graph items as they are consumed, for use in a streaming pipeline. Raises ValueError on a problem"""
+    checker = _GraphChecker()
+    for item in items:
+        problems = checker.check(item)
+        if problems:
+            raise ValueError('Invalid crate item: ' + '; '.join(str(p) for p in problems))
+        yield item
+
+
+def write_rocrate(data: dict, path: Path, compact: bool = False) -> bool:
     assert not path.exists(), f"Output path {path} already exists"
     assert path.match('*.json'), "Expected output to be .json"
 
-    with open(path, 'w+') as f:
-        json.dump(data, f, indent=2)
+    # @graph is streamed, so may also be a generator of items
+    write_jsonld(path, data['@graph'], data['@context'], compact=compact)
 
     return True
+
+
+def convert_wep(input_path: Path, output_path: Path, compact: bool = False) -> int:
+    """Convert a WEP file to a prospective crate, returning the number of @graph items written"""
+    count = 0
+
+    def _counted(items):
+        nonlocal count
+        for item in items:
+            count += 1
+            yield item
+
+    wep_json = load_wep(input_path)
+    # Graph items are generated, validated and written one at a time
+    rocrate_json = stream_wep_to_rocrate(wep_json)
+    rocrate_json['@graph'] = _counted(iter_validated(rocrate_json['@graph']))
+    write_rocrate(rocrate_json, output_path, compact=compact)
+
+    return count
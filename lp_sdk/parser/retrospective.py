@@ -1,9 +1,14 @@
-import json
 import uuid
 from pathlib import Path
 
+from lp_sdk.parser.jsonld import content_id, write_jsonld
 
-def format_retro_rocrate(data: dict) -> dict:
+
+def format_retro_rocrate(data: dict, deterministic_ids: bool = False) -> dict:
+    """
+    Wrap action data in a crate as a CreateAction. With deterministic_ids, the action's id is derived from data, so
+    the same data always gives an identical crate, rather than a random id
+    """
     # Not sure where these come from, yet:
     basics = {
         '@context': 'https://w3id.org/ro/crate/1.1/context',
@@ -11,7 +16,7 @@ def format_retro_rocrate(data: dict) -> dict:
     }
 
     basics['@graph'].append({
-        '@id': str(uuid.uuid4()),
+        '@id': content_id(data) if deterministic_ids else str(uuid.uuid4()),
         '@type': 'CreateAction',
         **data
                             })
@@ -19,8 +24,7 @@ def format_retro_rocrate(data: dict) -> dict:
     return basics
 
 
-def write_retro_rocrate(data: dict, path: Path):
+def write_retro_rocrate(data: dict, path: Path, compact: bool = False):
     assert not path.exists(), f"Output path {path} already exists"
 
-    with open(path, 'w+') as f:
-        json.dump(data, f, indent=2)
+    write_jsonld(path, data['@graph'], data['@context'], compact=compact)
@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from pathlib import Path
+
+from pydantic import TypeAdapter, ValidationError
+
+from lp_sdk.parser.jsonld import atomic_path
+from lp_sdk.parser.wep_parsing import ComputeState, TransferState, WepPlan, compile_wep
+
+# Bump when the parsed models or their serialized form change, so stale on-disk entries are not loaded
+CACHE_VERSION = 1
+
+ParsedStates = tuple[list[ComputeState], list[TransferState]]
+_PARSED_STATES = TypeAdapter(ParsedStates)
+
+
+def canonical_hash(document) -> str:
+    """sha256 of a JSON document, independent of key order and formatting"""
+    encoded = json.dumps(document, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class _LRU(OrderedDict):
+    """A mapping which drops its least recently used entries beyond maxsize"""
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+class ParseCache:
+    """
+    Memoizes parse_states, keyed by the canonical hashes of the WEP and input documents.
+
+    Results are kept in an in-process LRU, and if cache_dir is given, also stored there as gzipped JSON so they can be
+    reused across processes. Compiled plans are kept per WEP, so new inputs to a known WEP skip compilation. Results
+    are shared between callers, so should not be modified.
+    """
+    def __init__(self, maxsize: int = 128, cache_dir: Path | None = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._results = _LRU(maxsize)
+        self._plans = _LRU(maxsize)
+
+    def parse_states(self, wep: dict, input_: dict, trusted: bool = False) -> ParsedStates:
+        """As wep_parsing.parse_states, returning a cached result if this WEP and input have been parsed before"""
+        wep_digest = canonical_hash(wep)
+        digest = hashlib.sha256(f'{CACHE_VERSION}:{wep_digest}:{canonical_hash(input_)}'.encode()).hexdigest()
+
+        # Results parsed trusted were not validated, so are not returned for a validated parse
+        key = (digest, trusted)
+        result = self._results.get(key)
+        if result is None and trusted:
+            result = self._results.get((digest, False))
+        if result is None:
+            result = self._load(digest)
+        if result is not None:
+            self.hits += 1
+            self._results.put(key, result)
+            return result
+
+        self.misses += 1
+        result = self._plan(wep, wep_digest).bind(input_, trusted)
+        self._results.put(key, result)
+        if not trusted:
+            self._store(digest, result)
+        return result
+
+    def plan(self, wep: dict) -> WepPlan:
+        """The compiled plan for a WEP, compiling it if not already cached"""
+        return self._plan(wep, canonical_hash(wep))
+
+    def _plan(self, wep: dict, wep_digest: str) -> WepPlan:
+        plan = self._plans.get(wep_digest)
+        if plan is None:
+            plan = compile_wep(wep)
+            self._plans.put(wep_digest, plan)
+        return plan
+
+    def clear(self):
+        """Empty the in-process cache (the on-disk cache is left as is)"""
+        self._results.clear()
+        self._plans.clear()
+
+    def _entry_path(self, digest: str) -> Path:
+        return self.cache_dir / digest[:2] / f'{digest}.json.gz'
+
+    def _load(self, digest: str) -> ParsedStates | None:
+        if self.cache_dir is None:
+            return None
+        try:
+            with gzip.open(self._entry_path(digest), 'rb') as f:
+                return _PARSED_STATES.validate_json(f.read())
+        except (OSError, EOFError, ValidationError):
+            # Missing, truncated or corrupt entries are all treated as a miss (and replaced)
+            return None
+
+    def _store(self, digest: str, result: ParsedStates):
+        if self.cache_dir is None:
+            return
+        path = self._entry_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_path(path) as tmp_path, gzip.open(tmp_path, 'xb') as f:
+            f.write(_PARSED_STATES.dump_json(result))
+
+
+_default_cache = ParseCache()
+
+
+def cached_parse_states(wep: dict, input_: dict, trusted: bool = False) -> ParsedStates:
+    """parse_states, memoized in a process-wide ParseCache (in memory only)"""
+    return _default_cache.parse_states(wep, input_, trusted)
@@ -0,0 +1,153 @@
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+STATE_TYPES = {'Action', 'Choice', 'Parallel', 'Map', 'Pass', 'Wait', 'Succeed', 'Fail'}
+
+
+class WepGraphError(ValueError):
+    """A WEP's states do not form a valid graph"""
+
+
+class WepCycleError(WepGraphError):
+    """A WEP's states contain a cycle"""
+    def __init__(self, cycle: list[str]):
+        super().__init__(f"Cycle detected in WEP: {' -> '.join(cycle)}")
+        self.cycle = cycle
+
+
+@dataclass
+class StateNode:
+    """A state in a WEP, with its outgoing edges, and sub-graphs for Parallel/Map states"""
+    name: str
+    type: str
+    state: dict
+    next: list[str] = field(default_factory=list)
+    branches: list['WepGraph'] = field(default_factory=list)
+
+
+def _state_type(name: str, state: dict) -> str:
+    # Older WEPs omit Type for action states
+    state_type = state.get('Type', 'Action' if 'ActionUrl' in state else None)
+    if state_type not in STATE_TYPES:
+        raise NotImplementedError(f'Unknown state type for {name}: {state_type}')
+    return state_type
+
+
+def _successors(state_type: str, state: dict) -> list[str]:
+    """Names of the states that may follow a state, in order: Choices, Default, Next, then Catch handlers"""
+    successors = []
+    if state_type == 'Choice':
+        successors.extend(choice['Next'] for choice in state.get('Choices', []))
+        if 'Default' in state:
+            successors.append(state['Default'])
+    elif state_type not in ('Succeed', 'Fail') and not state.get('End', False) and 'Next' in state:
+        successors.append(state['Next'])
+    successors.extend(catch['Next'] for catch in state.get('Catch', []) if 'Next' in catch)
+
+    # Keep the first occurrence of each, so that e.g. several Choices with the same target are a single edge
+    return list(dict.fromkeys(successors))
+
+
+class WepGraph:
+    """
+    The states of a WEP (or of a Parallel branch / Map iterator) as a directed graph.
+
+    Edges are followed from StartAt via Next, Choices/Default and Catch, so only reachable states are included.
+    Parallel branches and Map iterators are parsed recursively into sub-graphs of their StateNode. All traversals are
+    O(V + E), and cycles raise WepCycleError.
+    """
+    def __init__(self, flow: dict):
+        self.start_at = flow['StartAt']
+        self.nodes: dict[str, StateNode] = {}
+
+        states = flow['States']
+        if self.start_at not in states:
+            raise WepGraphError(f'StartAt state {self.start_at} not found in WEP')
+
+        # Breadth first from StartAt, each state is visited once
+        queue = deque([self.start_at])
+        while queue:
+            name = queue.popleft()
+            if name in self.nodes:
+                continue
+            state = states[name]
+            state_type = _state_type(name, state)
+            node = StateNode(name, state_type, state, _successors(state_type, state))
+
+            if state_type == 'Parallel':
+                node.branches = [WepGraph(branch) for branch in state.get('Branches', [])]
+            elif state_type == 'Map':
+                iterator = state.get('ItemProcessor', state.get('Iterator'))
+                if iterator is not None:
+                    node.branches = [WepGraph(iterator)]
+
+            for successor in node.next:
+                if successor not in states:
+                    raise WepGraphError(f'State {name} references unknown state {successor}')
+                queue.append(successor)
+            self.nodes[name] = node
+
+        self._order = self._topological_order()
+
+    def _topological_order(self) -> list[StateNode]:
+        """Kahn's algorithm, raising WepCycleError if any states remain unordered"""
+        in_degree = dict.fromkeys(self.nodes, 0)
+        for node in self.nodes.values():
+            for successor in node.next:
+                in_degree[successor] += 1
+
+        order = []
+        ready = deque(name for name, degree in in_degree.items() if degree == 0)
+        while ready:
+            node = self.nodes[ready.popleft()]
+            order.append(node)
+            for successor in node.next:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    ready.append(successor)
+
+        if len(order) != len(self.nodes):
+            raise WepCycleError(self._find_cycle({name for name, degree in in_degree.items() if degree > 0}))
+        return order
+
+    def _find_cycle(self, remaining: set[str]) -> list[str]:
+        """Find a cycle among the states left over by Kahn's algorithm, all of which lie on or after a cycle"""
+        # Every remaining state has a remaining predecessor, so walking predecessors must revisit a state
+        predecessors = {}
+        for node in self.nodes.values():
+            for successor in node.next:
+                if node.name in remaining and successor in remaining:
+                    predecessors.setdefault(successor, node.name)
+
+        seen = {}
+        name = next(iter(sorted(remaining)))
+        while name not in seen:
+            seen[name] = len(seen)
+            name = predecessors[name]
+        path = list(seen)[seen[name]:]
+        return [*reversed(path), path[-1]]
+
+    def topological_order(self) -> list[StateNode]:
+        """States ordered so that every state comes after all states that may precede it"""
+        return self._order
+
+    def positions(self) -> dict[str, int]:
+        """Position of each state in topological order"""
+        return {node.name: i for i, node in enumerate(self._order)}
+
+    def iter_branches(self) -> Iterator[tuple[str, int, 'WepGraph']]:
+        """
+        Recursively yield (state name, branch index, sub-graph) for every Parallel branch and Map iterator.
+        Branches of the same Parallel state do not depend on each other, so may be processed concurrently.
+        """
+        for node in self._order:
+            for i, branch in enumerate(node.branches):
+                yield node.name, i, branch
+                yield from branch.iter_branches()
+
+    def __iter__(self) -> Iterator[StateNode]:
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self.nodes)
@@ -1,31 +1,203 @@
-from typing import Any
+import ast
+import re
+from collections.abc import Callable, Iterable
+from functools import cache, lru_cache
+from typing import Any, NamedTuple
 
 from pydantic import BaseModel
 
+from lp_sdk.parser.wep_graph import WepGraph
+
+_PATH_SEGMENT = re.compile(r'\.([^.\[\]]+)|\[(\d+)\]')
+
+
+class PathLookupError(KeyError):
+    """A JSONPath could not be resolved against a document"""
+    def __init__(self, path: str, segment: str | int, resolved: str):
+        super().__init__(path)
+        self.path = path
+        self.segment = segment
+        self.resolved = resolved
+
+    def __str__(self):
+        return f"Path {self.path}: segment {self.segment!r} not found in {self.resolved}"
+
+
+class CompiledPath:
+    """A JSONPath (e.g.: $.input.a.b, $.results[0].id), pre-split into segments so lookups don't re-parse it"""
+    __slots__ = ('path', 'segments')
+
+    def __init__(self, path: str, segments: tuple[str | int, ...]):
+        self.path = path
+        self.segments = segments
+
+    def __call__(self, data):
+        for i, segment in enumerate(self.segments):
+            try:
+                data = data[segment]
+            except (KeyError, IndexError, TypeError):
+                raise PathLookupError(self.path, segment, self._resolved(i)) from None
+        return data
+
+    def _resolved(self, n: int) -> str:
+        """The path up to (not including) segment n, for error messages"""
+        return '$' + ''.join(f'[{s}]' if isinstance(s, int) else f'.{s}' for s in self.segments[:n])
+
+    def __repr__(self):
+        return f'CompiledPath({self.path!r})'
+
+
+@lru_cache(maxsize=4096)
+def compile_path(path: str) -> CompiledPath:
+    """
+    Compile a JSONPath of dot-separated keys and integer indices. Compiled paths are cached (LRU). As in earlier
+    versions, a path without the leading $ (e.g.: input.a) is relative to the root.
+    """
+    if not isinstance(path, str):
+        raise TypeError(f'JSONPath {path!r} is not a string')
+    # Parse relative paths as $.<path>, reporting positions in the path as given
+    spec, offset = (path, 0) if path.startswith('$') else (f'$.{path}', 2)
+
+    segments = []
+    pos = 1
+    for match in _PATH_SEGMENT.finditer(spec, 1):
+        if match.start() != pos:
+            break
+        key, index = match.groups()
+        segments.append(int(index) if index is not None else key)
+        pos = match.end()
+    if pos != len(spec):
+        raise ValueError(f'Unsupported JSONPath {path!r}, at position {max(pos - offset, 0)}')
+
+    return CompiledPath(path, tuple(segments))
+
+
+_EXPRESSION_TOKEN = re.compile(r"""\s*(?:
+    (?P<path>`[^`]*`)
+    |(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    |(?P<number>\d+(?:\.\d+)?)
+    |(?P<op>[+()])
+)""", re.VERBOSE)
+
+
+class ExpressionError(ValueError):
+    """A .= expression uses syntax outside the supported subset"""
+
+
+class CompiledExpression:
+    """
+    A Globus flow expression (the value of a .= key), parsed once into an AST and compiled to a function of the
+    document it is evaluated against.
+
+    Supports the subset of the expression language generated by the SDK: backtick-quoted JSONPath references,
+    string and number literals, + (string concatenation or addition), and parentheses. e.g.:
+        `$.input.directory` + '/' + `$.RevTxt.details.results[0].task_id`
+    """
+    __slots__ = ('_evaluate', 'ast', 'expression', 'paths')
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.paths = []
+        tokens = self._tokenize(expression)
+        self.ast, pos = self._parse_sum(tokens, 0)
+        if pos != len(tokens):
+            raise ExpressionError(f'Unexpected {tokens[pos][1]!r} in expression {expression!r}')
+        self._evaluate = self._compile(self.ast)
+
+    def __call__(self, data):
+        return self._evaluate(data)
+
+    def __repr__(self):
+        return f'CompiledExpression({self.expression!r})'
+
+    def _tokenize(self, expression: str) -> list[tuple[str, str]]:
+        tokens = []
+        pos = 0
+        expression = expression.rstrip()
+        while pos < len(expression):
+            match = _EXPRESSION_TOKEN.match(expression, pos)
+            if match is None:
+                pos += len(expression[pos:]) - len(expression[pos:].lstrip())
+                raise ExpressionError(f'Unsupported syntax at position {pos} of expression {expression!r}')
+            tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            pos = match.end()
+        return tokens
+
+    def _parse_sum(self, tokens: list, pos: int) -> tuple[tuple, int]:
+        """sum := term ('+' term)*"""
+        node, pos = self._parse_term(tokens, pos)
+        while pos < len(tokens) and tokens[pos] == ('op', '+'):
+            right, pos = self._parse_term(tokens, pos + 1)
+            node = ('add', node, right)
+        return node, pos
+
+    def _parse_term(self, tokens: list, pos: int) -> tuple[tuple, int]:
+        """term := path | string | number | '(' sum ')'"""
+        if pos >= len(tokens):
+            raise ExpressionError(f'Unexpected end of expression {self.expression!r}')
+        kind, text = tokens[pos]
+        if kind == 'path':
+            # Unlike .$ lookups, which predate expressions, paths in expressions must start with $
+            if not text.startswith('`$'):
+                raise ExpressionError(f'JSONPath {text} must start with $ in expression {self.expression!r}')
+            path = compile_path(text[1:-1])
+            self.paths.append(path.path)
+            return ('path', path), pos + 1
+        if kind in ('string', 'number'):
+            return ('literal', ast.literal_eval(text)), pos + 1
+        if text == '(':
+            node, pos = self._parse_sum(tokens, pos + 1)
+            if pos >= len(tokens) or tokens[pos] != ('op', ')'):
+                raise ExpressionError(f'Unbalanced parentheses in expression {self.expression!r}')
+            return node, pos + 1
+        raise ExpressionError(f'Unexpected {text!r} in expression {self.expression!r}')
+
+    def _compile(self, node: tuple):
+        kind = node[0]
+        if kind == 'literal':
+            value = node[1]
+            return lambda data: value
+        if kind == 'path':
+            return node[1]
+        left, right = self._compile(node[1]), self._compile(node[2])
+        return lambda data: left(data) + right(data)
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(expression: str) -> CompiledExpression:
+    """Compile a .= expression. Compiled expressions are cached (LRU)"""
+    return CompiledExpression(expression)
+
 
 def _chain_get(data: dict, key: str):
-    """Get a value from a nested dictionary using a dot-separated key"""
-    keys = key.strip('$.').split('.')
-    for k in keys:
-        data = data[k]
-    return data
+    """Get a value from a nested dictionary using a JSONPath key"""
+    return compile_path(key)(data)
 
 
 class InputValue(BaseModel):
-    """Represents a globus lookup key and the value retrieved from input"""
+    """Represents a globus lookup key (or .= expression) and the value retrieved from input"""
     key: str
     value: Any
 
 
+@cache
+def _form_keys(key: str) -> tuple[str, str]:
+    """Lookup (.$) and expression (.=) forms of a key"""
+    return f'{key}.$', f'{key}.='
+
+
 def _match_form(data: dict, input_: dict, key: str) -> str | InputValue:
     """Retrieve the value of a key from the WEP, handling literal keys, lookup keys (.$), and expression keys (.=)"""
     if key in data:
         return data[key]
-    elif f'{key}.$' in data:
-        return InputValue(key=data[f'{key}.$'], value=_chain_get(input_, data[f'{key}.$']))
-    elif f'{key}.=' in data:
-        raise NotImplementedError()
-    raise KeyError()
+    lookup_key, expression_key = _form_keys(key)
+    if lookup_key in data:
+        path = data[lookup_key]
+        return InputValue(key=path, value=compile_path(path)(input_))
+    elif expression_key in data:
+        expression = data[expression_key]
+        return InputValue(key=expression, value=compile_expression(expression)(input_))
+    raise KeyError(key)
 
 
 class Task(BaseModel):
@@ -89,27 +261,182 @@ class TransferState(BaseModel):
         )
 
 
-def parse_states(wep: dict, input_: dict) -> tuple[list[ComputeState], list[TransferState]]:
-    """Parse a WEP into a list of TransferState and ComputeState objects"""
-    compute_states = []
-    transfer_states = []
-    pos = 0
-    state_name = wep['StartAt']
-    while True:
-        state = wep['States'][state_name]
-        if state['ActionUrl'] == 'https://transfer.actions.globus.org/transfer/':
-            if 'provenance' in state_name:
-                # TODO: better way of detecting these
-                pass
+class _Models(NamedTuple):
+    """Constructors used when binding a WepPlan"""
+    input_value: Callable[..., InputValue]
+    task: Callable[..., Task]
+    transfer_item: Callable[..., TransferItem]
+    compute_state: Callable[..., ComputeState]
+    transfer_state: Callable[..., TransferState]
+
+
+_VALIDATED_MODELS = _Models(InputValue, Task, TransferItem, ComputeState, TransferState)
+# Built with model_construct, without validation (or type coercion), for WEPs and inputs already known to be valid
+_TRUSTED_MODELS = _Models(*(model.model_construct for model in _VALIDATED_MODELS))
+
+
+TRANSFER_URL = 'https://transfer.actions.globus.org/transfer/'
+COMPUTE_URL = 'https://compute.actions.globus.org'
+
+
+class WepPlan:
+    """
+    A WEP compiled for repeated parsing against different inputs.
+
+    Compiling walks the WEP's state graph once (see WepGraph), recording the topological order and kind of each state,
+    and turns every field into a binder: a literal value, a compiled lookup path, or a compiled expression (see paths
+    for all lookups the WEP makes). Binding an input then only resolves those lookups and builds the state objects.
+
+    States within Parallel branches and Map iterators are included, following their parent state. Parallel branches
+    are bound against the same input as their parent. Map iterators are bound once per item (the list at ItemsPath),
+    against that item, giving their states once per item. ItemSelector (or Parameters) of Map states is not supported.
+    """
+    def __init__(self, wep: dict, position: int = 0):
+        self.graph = WepGraph(wep) if wep is not None else None
+        self.order = []  # (state name, 'compute' | 'transfer' | 'provenance' | other state type, lower case)
+        self.paths = set()  # JSONPaths looked up in the input
+        self._binders = []  # ('compute' | 'transfer' | 'map', binder, see bind)
+        self._position = position
+
+        if self.graph is not None:
+            self._compile_graph(self.graph)
+
+    def _compile_graph(self, graph: WepGraph):
+        for node in graph.topological_order():
+            state_name, state = node.name, node.state
+            if node.type != 'Action':
+                self.order.append((state_name, node.type.lower()))
+            elif state['ActionUrl'] == TRANSFER_URL:
+                if 'provenance' in state_name:
+                    # TODO: better way of detecting these
+                    self.order.append((state_name, 'provenance'))
+                else:
+                    self.order.append((state_name, 'transfer'))
+                    self._binders.append(('transfer', self._compile_transfer(state)))
+            elif state['ActionUrl'] == COMPUTE_URL:
+                self.order.append((state_name, 'compute'))
+                self._binders.append(('compute', self._compile_compute(state_name, state, self._position)))
+                self._position += 1
             else:
-                transfer_states.append(TransferState.parse(state, input_))
-        elif state['ActionUrl'] == 'https://compute.actions.globus.org':
-            compute_states.append(ComputeState.parse(state_name, state, input_, pos))
-            pos += 1
-        else:
-            raise NotImplementedError(f'Unknown state type: {state["ActionUrl"]}')
-        state_name = state.get('Next', None)
-        if state_name is None:
-            break
+                raise ValueError(f'Unsupported ActionUrl {state["ActionUrl"]} of state {state_name}')
+
+            if node.type == 'Map':
+                for iterator in node.branches:
+                    self._binders.append(('map', self._compile_map(state_name, state, iterator)))
+            else:
+                for branch in node.branches:
+                    self._compile_graph(branch)
+
+    def _compile_map(self, name: str, state: dict, iterator: WepGraph):
+        """Compile a Map iterator into a plan of its own, bound against each item of the list at ItemsPath"""
+        if 'ItemSelector' in state or 'Parameters' in state:
+            raise ValueError(f'ItemSelector/Parameters of Map state {name} is not supported')
+        items = compile_path(state.get('ItemsPath', '$'))
+        self.paths.add(items.path)
+
+        # Lookups of the iterator are relative to the item, so its paths are not the plan's
+        plan = WepPlan(None, self._position)
+        plan._compile_graph(iterator)
+        self.order.extend(plan.order)
+        self._position = plan._position
+
+        def _bind(input_: dict, models: _Models, compute_states: list, transfer_states: list):
+            values = items(input_)
+            if not isinstance(values, list):
+                raise TypeError(f'ItemsPath {items.path} of Map state {name} is not a list')
+            for item in values:
+                plan._bind_into(item, models, compute_states, transfer_states)
+        return _bind
+
+    def _compile_form(self, data: dict, key: str):
+        """Compile the value of a key from the WEP into a function of the input, see _match_form"""
+        if key in data:
+            value = data[key]
+            return lambda input_, models: value
+        lookup_key, expression_key = _form_keys(key)
+        if lookup_key in data:
+            path = compile_path(data[lookup_key])
+            self.paths.add(path.path)
+            return lambda input_, models: models.input_value(key=path.path, value=path(input_))
+        elif expression_key in data:
+            expression = compile_expression(data[expression_key])
+            self.paths.update(expression.paths)
+            return lambda input_, models: models.input_value(key=expression.expression, value=expression(input_))
+        raise KeyError(key)
+
+    def _compile_compute(self, name: str, state: dict, position: int):
+        comment = state['Comment']
+        result_path = state['ResultPath']
+        tasks = [
+            tuple(self._compile_form(task, key) for key in ('endpoint', 'function', 'payload'))
+            for task in state['Parameters']['tasks']
+        ]
+
+        def _bind(input_: dict, models: _Models) -> ComputeState:
+            return models.compute_state(
+                name=name,
+                comment=comment,
+                tasks=[
+                    models.task(endpoint=e(input_, models), function=f(input_, models), payload=p(input_, models))
+                    for e, f, p in tasks
+                ],
+                resultPath=result_path,
+                position=position,
+            )
+        return _bind
+
+    def _compile_transfer(self, state: dict):
+        params = state['Parameters']
+        source_endpoint = self._compile_form(params, 'source_endpoint')
+        destination_endpoint = self._compile_form(params, 'destination_endpoint')
+        items = [
+            tuple(self._compile_form(item, key) for key in ('source_path', 'destination_path', 'recursive'))
+            for item in params['transfer_items']
+        ]
+
+        def _bind(input_: dict, models: _Models) -> TransferState:
+            return models.transfer_state(
+                source_endpoint=source_endpoint(input_, models),
+                destination_endpoint=destination_endpoint(input_, models),
+                transfer_items=[
+                    models.transfer_item(source_path=s(input_, models), destination_path=d(input_, models),
+                                         recursive=r(input_, models))
+                    for s, d, r in items
+                ],
+            )
+        return _bind
+
+    def bind(self, input_: dict, trusted: bool = False) -> tuple[list[ComputeState], list[TransferState]]:
+        """Resolve the plan against a flow input, equivalent to parse_states(wep, input_, trusted)"""
+        compute_states = []
+        transfer_states = []
+        self._bind_into(input_, _TRUSTED_MODELS if trusted else _VALIDATED_MODELS, compute_states, transfer_states)
+        return compute_states, transfer_states
+
+    def _bind_into(self, input_: dict, models: _Models, compute_states: list, transfer_states: list):
+        for kind, bind in self._binders:
+            if kind == 'compute':
+                compute_states.append(bind(input_, models))
+            elif kind == 'transfer':
+                transfer_states.append(bind(input_, models))
+            else:
+                bind(input_, models, compute_states, transfer_states)
+
+    def bind_many(self, inputs: Iterable[dict],
+                  trusted: bool = False) -> list[tuple[list[ComputeState], list[TransferState]]]:
+        """Resolve the plan against each of a batch of flow inputs"""
+        return [self.bind(input_, trusted) for input_ in inputs]
+
+
+def compile_wep(wep: dict) -> WepPlan:
+    """Compile a WEP into a plan which can be bound to many inputs, see WepPlan"""
+    return WepPlan(wep)
+
 
-    return compute_states, transfer_states
+def parse_states(wep: dict, input_: dict, trusted: bool = False) -> tuple[list[ComputeState], list[TransferState]]:
+    """
+    Parse a WEP into a list of TransferState and ComputeState objects.
+    If trusted (e.g.: re-ingesting a WEP generated by the SDK), models are constructed without pydantic validation,
+    with model_construct. See benchmarks/bench_wep_trusted.py for how that compares on the installed pydantic.
+    """
+    return compile_wep(wep).bind(input_, trusted)
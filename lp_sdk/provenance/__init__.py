@@ -1,3 +1,16 @@
-from .crate import LpProvCrate
+import importlib
 
-__all__ = ['LpProvCrate']
\ No newline at end of file
+# LpProvCrate pulls in rocrate and runcrate, which are slow to import, so it is only loaded on first access
+_lazy_imports = {
+    'LpProvCrate': '.crate',
+    'Placement': '.placement',
+}
+
+
+def __getattr__(name):
+    if name in _lazy_imports:
+        return getattr(importlib.import_module(_lazy_imports[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['LpProvCrate', 'Placement']
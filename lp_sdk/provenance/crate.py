@@ -1,19 +1,59 @@
 import json
 import uuid
+from collections.abc import Iterable
 from pathlib import Path
 
 from rocrate.model import ContextEntity, ComputationalWorkflow, ComputerLanguage
 from rocrate.rocrate import ROCrate
-from runcrate import convert
+from lp_sdk.parser.jsonld import content_id
+from lp_sdk.provenance.cwl import cwl_definitions
+from lp_sdk.provenance.placement import Placement, write_crate
+
+
+class LeanEntity(ContextEntity):
+    """
+    A ContextEntity held in LpProvCrate's own store rather than added to the ROCrate, see LpProvCrate(lean=True).
+    Its properties are a plain dict, which is written as is. References from it to other lean entities are not
+    dereferenced on access (the id is returned instead).
+    """
+    def __init__(self, crate, identifier=None, properties=None):
+        self.crate = crate
+        # As Entity.__init__, so ids are the same as in a regular crate
+        self.id = self.format_id(identifier) if identifier else f'#{uuid.uuid4()}'
+        self._jsonld = {'@id': self.id, '@type': 'Thing'}
+        if properties:
+            self._jsonld.update(properties)
 
 
 class LpProvCrate:
-    def __init__(self, path: str):
+    """
+    A provenance crate, built from a workflow definition.
+
+    With lean=True, workflow entities (parameters, steps, tools, connections, profiles and software) are not added to
+    the ROCrate object model, but kept as plain dicts in an id-indexed store, and streamed after the ROCrate's own
+    entities when writing ro-crate-metadata.json. This gives the same @graph, with a fraction of the per-entity
+    overhead. Use get to look up entities in either mode.
+
+    With deterministic_ids=True, ids that would be random (parameter connections) are derived from their content, so
+    rebuilding an unchanged workflow gives an identical crate, provided date_published (the root dataset's
+    datePublished, otherwise the current time) is also fixed.
+    """
+    def __init__(self, path: str, lean: bool = False, deterministic_ids: bool = False,
+                 date_published: str | None = None):
         self.path = Path(path)
         self.crate = ROCrate()
-
-    def build_from_cwl(self, wf_file: Path):
-        """Build a crate from a workflow file"""
+        if date_published is not None:
+            self.crate.root_dataset['datePublished'] = date_published
+        self.lean = lean
+        self.deterministic_ids = deterministic_ids
+        self._entity_cls = LeanEntity if lean else ContextEntity
+        # Parameters and steps by id, so repeated additions return (and update) the existing entity
+        self._entities: dict[str, ContextEntity] = {}
+        # Entities not in the ROCrate, by id (lean mode only)
+        self._lean_entities: dict[str, LeanEntity] = {}
+
+    def build_from_cwl(self, wf_file: Path, cache_dir: Path | None = None):
+        """Build a crate from a workflow file. Parsed CWL is cached in cache_dir if given, see cwl_definitions"""
         # Add rocrate profiles
         # TODO: don't hard-code these, get from somewhere
         profiles = [
@@ -30,48 +70,45 @@ class LpProvCrate:
         #       but should eventually be refactored so that we can handle both in full detail
 
         # Add workflow
-        wf_defs = convert.get_workflow(wf_file)
+        wf_defs = cwl_definitions(wf_file, cache_dir)
         wf = self.add_workflow(wf_file)
 
-        for input in wf_defs[wf.id].inputs:
-            id = f'{input.id.split("#")[-1]}'
-            input_ent = self.add_parameter(f'{wf.id}#{id}', id,
-                                           convert.properties_from_cwl_param(input))
-            wf.append_to('input', input_ent)
-
-        for output in wf_defs[wf.id].outputs:
-            id = f'{output.id.split("#")[-1]}'
-            output_ent = self.add_parameter(f'{wf.id}#{id}', id,
-                                            convert.properties_from_cwl_param(output))
-            wf.append_to('output', output_ent)
-
-        pos_map = convert.ProvCrateBuilder._get_step_maps(wf_defs)
-
-        # Add steps
-        for step in getattr(wf_defs[wf.id], 'steps', []):
-            id = f'{step.id.split("#")[-1]}'
-            pos = pos_map[wf.id][id]['pos']
-            step_ent = self.add_step(f'{wf.id}#{id}', str(pos))
-            wf.append_to('step', step_ent)
-
-            # Add tools
-            tool_id = f'{step.run.split("#")[-1]}'
-            tool_ent = self.add_tool(f'{wf.id}#{tool_id}', tool_id, wf_defs[tool_id].doc)
-
-            for input in wf_defs[tool_id].inputs:
-                id = f'{input.id.split("#")[-1]}'
-                input_ent = self.add_parameter(f'{wf.id}#{id}', id,
-                                               convert.properties_from_cwl_param(input))
-                tool_ent.append_to('input', input_ent)
-
-            for output in wf_defs[tool_id].outputs:
-                id = f'{output.id.split("#")[-1]}'
-                output_ent = self.add_parameter(f'{wf.id}#{id}', id,
-                                                convert.properties_from_cwl_param(output))
-                tool_ent.append_to('output', output_ent)
+        self._append_all(wf, 'input', self._add_cwl_parameters(wf, wf_defs[wf.id]['inputs']))
+        self._append_all(wf, 'output', self._add_cwl_parameters(wf, wf_defs[wf.id]['outputs']))
 
-            wf.append_to('hasPart', tool_ent)
+        # Add steps, recursing into subworkflows
+        self._add_cwl_steps(wf, wf, wf_defs, wf.id, tools={})
+
+    def _add_cwl_steps(self, wf: ComputationalWorkflow, parent: ContextEntity, wf_defs: dict, def_id: str,
+                       tools: dict[str, ContextEntity]):
+        """Add the steps of wf (or of a subworkflow of it, parent) and the tools they run, see _add_cwl_tool"""
+        steps = wf_defs[def_id]['steps']
+        step_ents = self.add_steps((f'{wf.id}#{step["id"]}', str(step['pos'])) for step in steps)
+        self._append_all(parent, 'step', step_ents)
+
+        parts = {}
+        for step, step_ent in zip(steps, step_ents):
+            tool_ent = tools.get(step['tool']) or self._add_cwl_tool(wf, wf_defs, step['tool'], tools)
+            parts[tool_ent.id] = tool_ent
             step_ent['workExample'] = tool_ent
+        self._append_all(parent, 'hasPart', list(parts.values()))
+
+    def _add_cwl_tool(self, wf: ComputationalWorkflow, wf_defs: dict, tool_id: str,
+                      tools: dict[str, ContextEntity]) -> ContextEntity:
+        """
+        Add a tool (or subworkflow, with its steps) and its parameters. Tools are added once, and recorded in tools,
+        however many steps (in any subworkflow) run them
+        """
+        definition = wf_defs[tool_id]
+        tool_ent = tools[tool_id] = self.add_tool(f'{wf.id}#{tool_id}', tool_id, definition['doc'])
+        self._append_all(tool_ent, 'input', self._add_cwl_parameters(wf, definition['inputs']))
+        self._append_all(tool_ent, 'output', self._add_cwl_parameters(wf, definition['outputs']))
+
+        if definition['steps']:
+            # Already recorded in tools, so a subworkflow which (invalidly) runs itself is not followed again
+            tool_ent.properties()['@type'] = ['SoftwareSourceCode', 'ComputationalWorkflow', 'HowTo']
+            self._add_cwl_steps(wf, tool_ent, wf_defs, tool_id, tools)
+        return tool_ent
 
     def build_from_wep(self, wep_file: Path, parser: callable):
         """Build a crate from a WEP file"""
@@ -114,13 +151,10 @@ class LpProvCrate:
 
         wf = self.add_workflow(wep_file, lang=globus_lang)
 
-        for input in step_info['main'].get('input', []):
-            input_ent = self.add_parameter(f'{wf.id}#{input}', input, param_props)
-            wf.append_to('input', input_ent)
-
-        for output in step_info['main'].get('output', []):
-            output_ent = self.add_parameter(f'{wf.id}#{output}', output, param_props)
-            wf.append_to('output', output_ent)
+        for key in ('input', 'output'):
+            self._append_all(wf, key, self.add_parameters(
+                (f'{wf.id}#{param}', param, param_props) for param in step_info['main'].get(key, [])
+            ))
 
         if 'main' in param_links:
             wf['connection'] = [
@@ -128,13 +162,12 @@ class LpProvCrate:
                 for source, target in param_links['main']
             ]
 
-        # Add steps
-        for step_id, step_info in step_info.items():
-            if step_id == 'main':
-                continue  # Main represents the workflow, not a step
-            step_ent = self.add_step(f'{wf.id}#main/{step_id}', str(step_info['pos']))
-            wf.append_to('step', step_ent)
+        # Add steps, main represents the workflow, not a step
+        steps = [(step_id, info) for step_id, info in step_info.items() if step_id != 'main']
+        step_ents = self.add_steps((f'{wf.id}#main/{step_id}', str(info['pos'])) for step_id, info in steps)
+        self._append_all(wf, 'step', step_ents)
 
+        for (step_id, step_info), step_ent in zip(steps, step_ents):
             # TODO: if adding parameter connections, add "https://w3id.org/ro/terms/workflow-run" to context
             if step_id in param_links:
                 step_ent['connection'] = [
@@ -146,13 +179,10 @@ class LpProvCrate:
             step_props = wep['States'][step_id]
             tool_ent = self.add_tool(f'{wf.id}#{step_id}', step_id, step_props['Comment'])
 
-            for input in step_info['input']:
-                input_ent = self.add_parameter(f'{wf.id}#{input}', input, param_props)
-                tool_ent.append_to('input', input_ent)
-
-            for output in step_info['output']:
-                output_ent = self.add_parameter(f'{wf.id}#{output}', output, param_props)
-                tool_ent.append_to('output', output_ent)
+            for key in ('input', 'output'):
+                self._append_all(tool_ent, key, self.add_parameters(
+                    (f'{wf.id}#{param}', param, param_props) for param in step_info[key]
+                ))
 
             wf.append_to('hasPart', tool_ent)
             step_ent['workExample'] = tool_ent
@@ -173,7 +203,7 @@ class LpProvCrate:
             'name': name,
             'version': version,
         }
-        return self.crate.add(ContextEntity(self.crate, id, properties=properties))
+        return self._add(self._entity_cls(self.crate, id, properties=properties))
 
     def add_tool(self, id, name, description) -> ContextEntity:
         properties = {
@@ -182,29 +212,77 @@ class LpProvCrate:
             'description': description,
             'name': name,
         }
-        return self.crate.add(ContextEntity(self.crate, id, properties=properties))
+        return self._add(self._entity_cls(self.crate, id, properties=properties))
 
     def add_software(self, id, name):
         properties = {'@type': 'SoftwareApplication', 'name': name}
 
-        return self.crate.add(ContextEntity(self.crate, id, properties=properties))
+        return self._add(self._entity_cls(self.crate, id, properties=properties))
 
-    def add_step(self, id, position):
-        properties = {
-            '@type': 'HowToStep',
-            'position': position,
-        }
-        return self.crate.add(ContextEntity(self.crate, id, properties=properties))
+    def add_step(self, id, position) -> ContextEntity:
+        return self.add_steps([(id, position)])[0]
+
+    def add_steps(self, steps: Iterable[tuple[str, str]]) -> list[ContextEntity]:
+        """Add (id, position) steps in one pass, see _add_cached"""
+        return self._add_cached((id, {'@type': 'HowToStep', 'position': position}) for id, position in steps)
 
     def add_parameter(self, id, name=None, properties=None) -> ContextEntity:
-        if name:
-            properties = properties or {}
-            properties['name'] = name
+        return self.add_parameters([(id, name, properties)])[0]
+
+    def add_parameters(self, parameters: Iterable[tuple[str, str | None, dict | None]]) -> list[ContextEntity]:
+        """Add (id, name, properties) parameters in one pass, see _add_cached"""
+        return self._add_cached(
+            (id, {**(properties or {}), 'name': name} if name else properties)
+            for id, name, properties in parameters
+        )
 
-        return self.crate.add(ContextEntity(self.crate, id, properties=properties))
+    def _add_cached(self, entities: Iterable[tuple[str, dict | None]]) -> list[ContextEntity]:
+        """
+        Add (id, properties) entities to the crate, returning them in order. An id already added returns the existing
+        entity, with properties merged into it (rather than replacing it), so references to it remain valid.
+        """
+        result = []
+        new = []
+        for id, properties in entities:
+            entity = self._entities.get(id)
+            if entity is None:
+                entity = self._entities[id] = self._entity_cls(self.crate, id, properties=properties)
+                new.append(entity)
+            elif properties:
+                entity.properties().update(properties)
+            result.append(entity)
+
+        if new:
+            self._add(*new)
+        return result
+
+    def _add(self, *entities: ContextEntity):
+        """Add entities to the crate (or the lean store), replacing any with the same id. Returns the first entity"""
+        if self.lean:
+            for entity in entities:
+                self._lean_entities[entity.id] = entity
+        else:
+            self.crate.add(*entities)
+        return entities[0]
+
+    def get(self, id: str, default=None):
+        """Get an entity by id, whether it is in the ROCrate or (in lean mode) the lean store"""
+        entity = self._lean_entities.get(id)
+        return entity if entity is not None else self.crate.get(id, default)
+
+    def _add_cwl_parameters(self, wf: ComputationalWorkflow, params: list[tuple[str, dict]]) -> list[ContextEntity]:
+        """Add a batch of CWL inputs or outputs, as (id, properties), as parameters of wf"""
+        return self.add_parameters((f'{wf.id}#{id}', id, properties) for id, properties in params)
+
+    @staticmethod
+    def _append_all(entity: ContextEntity, key: str, values: list[ContextEntity]):
+        """Append a batch of entities to a property, leaving it unset if there are none"""
+        if values:
+            entity.append_to(key, values)
 
     def add_parameter_connection(self, source_id, target_id):
-        id = f'#{uuid.uuid4()}'
+        # Deterministic ids are derived from the parameters, so connecting the same pair again replaces the connection
+        id = f'#{content_id([source_id, target_id]) if self.deterministic_ids else uuid.uuid4()}'
 
         props = {
             '@type': 'ParameterConnection',
@@ -212,7 +290,7 @@ class LpProvCrate:
             'targetParameter': {'@id': target_id}
         }
 
-        return self.crate.add(ContextEntity(self.crate, id, props))
+        return self._add(self._entity_cls(self.crate, id, props))
 
     def add_file(self, path: str):
         self.crate.add_file(path)
@@ -220,5 +298,13 @@ class LpProvCrate:
     def add_howto(self, path: str):
         self.crate.add_howto(path)
 
-    def write(self):
-        self.crate.write(self.path)
+    def write(self, compact: bool = False, placement: Placement = Placement.COPY, max_workers: int | None = None,
+              incremental: bool = False):
+        """
+        Write the crate to path. compact (lean mode only) writes the metadata without indentation, which is faster.
+        Data files are placed with the given strategy (copy, hardlink, reflink, symlink or reference). With
+        incremental=True, only what changed since the last write is rewritten, see write_crate
+        """
+        # Lean entities are appended to the metadata, streamed rather than held as a single document
+        extra_entities = [e.properties() for e in self._lean_entities.values()] if self.lean else None
+        write_crate(self.crate, self.path, placement, max_workers, extra_entities, compact, incremental)
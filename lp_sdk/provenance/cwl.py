@@ -0,0 +1,63 @@
+import hashlib
+import json
+from pathlib import Path
+
+from runcrate import convert
+
+from lp_sdk.parser.jsonld import atomic_path
+
+# Bump when the extracted definitions change, so stale cache entries are not loaded
+CWL_CACHE_VERSION = 1
+
+
+def _cwl_params(params) -> list[tuple[str, dict]]:
+    """(id, properties) of CWL inputs or outputs, with ids relative to the packed workflow"""
+    return [(param.id.split('#')[-1], convert.properties_from_cwl_param(param)) for param in params]
+
+
+def _extract_definitions(wf_file: Path) -> dict:
+    wf_defs = convert.get_workflow(wf_file)
+    pos_map = convert.ProvCrateBuilder._get_step_maps(wf_defs)
+
+    definitions = {}
+    for def_id, definition in wf_defs.items():
+        step_ids = [step.id.split('#')[-1] for step in getattr(definition, 'steps', [])]
+        definitions[def_id] = {
+            'doc': definition.doc,
+            'inputs': _cwl_params(definition.inputs),
+            'outputs': _cwl_params(definition.outputs),
+            'steps': [
+                {'id': step_id, 'tool': step.run.split('#')[-1], 'pos': pos_map[def_id][step_id]['pos']}
+                for step_id, step in zip(step_ids, getattr(definition, 'steps', []))
+            ],
+        }
+    return definitions
+
+
+def cwl_definitions(wf_file: Path, cache_dir: Path | None = None) -> dict:
+    """
+    The workflow and tool definitions of a packed CWL workflow, as used by LpProvCrate.build_from_cwl: for each id (the
+    workflow's file name, or a tool's id) its doc, inputs and outputs as (id, properties), and steps as id/tool/pos.
+
+    Parsing CWL is slow, so if cache_dir is given, definitions are stored there as JSON keyed by the hash of the
+    workflow file, and reused while it is unchanged. Only the workflow file is hashed, which covers packed workflows
+    (e.g.: from cwltool --pack) but not changes to files they import.
+    """
+    wf_file = Path(wf_file)
+    if cache_dir is None:
+        return _extract_definitions(wf_file)
+
+    # Definitions are keyed by file name, so it is part of the key
+    digest = hashlib.sha256(f'{CWL_CACHE_VERSION}:{wf_file.name}:'.encode() + wf_file.read_bytes()).hexdigest()
+    cache_path = Path(cache_dir) / f'{digest}.json'
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass  # Missing or corrupt entries are re-extracted (and replaced)
+
+    definitions = _extract_definitions(wf_file)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_path(cache_path) as tmp_path, open(tmp_path, 'x') as f:
+        json.dump(definitions, f)
+    return definitions
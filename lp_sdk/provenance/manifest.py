@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from lp_sdk.parser.jsonld import atomic_path
+
+# Kept in the crate directory, alongside ro-crate-metadata.json
+MANIFEST_NAME = '.lp-crate-manifest.json'
+# Bump when the manifest format changes, so stale manifests are ignored (and everything rewritten)
+MANIFEST_VERSION = 1
+
+
+def graph_digest(context: Any, graph: Iterable[dict], *options) -> str:
+    """sha256 of a crate's @context and @graph (and any options affecting how they are written), one item at a time"""
+    h = hashlib.sha256(json.dumps([MANIFEST_VERSION, context, options], sort_keys=True, default=str).encode())
+    for item in graph:
+        h.update(json.dumps(item, sort_keys=True, separators=(',', ':'), default=str).encode())
+    return h.hexdigest()
+
+
+def file_signature(source: Path, placement: str) -> list:
+    """Identifies the state of a placed file: its source path, size and mtime, and how it was placed"""
+    st = os.stat(source)
+    return [str(source), st.st_size, st.st_mtime_ns, placement]
+
+
+class CrateManifest:
+    """
+    The graph digest and data file signatures of the last write of a crate, so that a rewrite only places files, and
+    writes the metadata, where they changed. Files are compared by signature (see file_signature) rather than by
+    content hash, which would mean reading every file on each write. A missing or unreadable manifest is empty.
+    """
+    def __init__(self, base_path: Path):
+        self.path = Path(base_path) / MANIFEST_NAME
+        self.graph = None
+        self.files = {}
+        try:
+            with open(self.path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(manifest, dict) and manifest.get('version') == MANIFEST_VERSION:
+            self.graph = manifest['graph']
+            self.files = manifest['files']
+
+    def unchanged_file(self, key: str, signature: list, dest: Path) -> bool:
+        """Whether the file at dest (key, relative to the crate) was placed from a source with this signature"""
+        return self.files.get(key) == signature and os.path.lexists(dest)
+
+    def save(self, graph: str, files: dict[str, list]):
+        """Replace the manifest, written atomically"""
+        self.graph, self.files = graph, files
+        with atomic_path(self.path) as tmp_path, open(tmp_path, 'x') as f:
+            json.dump({'version': MANIFEST_VERSION, 'graph': graph, 'files': files}, f)
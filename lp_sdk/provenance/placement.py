@@ -0,0 +1,198 @@
+import errno
+import itertools
+import json
+import os
+import shutil
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+
+from rocrate.model import Dataset, File
+from rocrate.rocrate import ROCrate
+from rocrate.utils import is_url, walk
+
+from lp_sdk.parser.jsonld import atomic_path, write_jsonld
+from lp_sdk.provenance.manifest import (
+    MANIFEST_NAME,
+    CrateManifest,
+    file_signature,
+    graph_digest,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl to clone a file's extents (btrfs, XFS, ...), from linux/fs.h
+FICLONE = 0x40049409
+# Errors meaning a link/clone is not possible here, rather than that placement failed
+_UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.EMLINK, errno.ENOSYS}
+
+
+class Placement(str, Enum):
+    """How data files are placed in the crate directory on write"""
+    COPY = 'copy'
+    HARDLINK = 'hardlink'
+    REFLINK = 'reflink'  # Copy-on-write clone, falling back to a copy where the filesystem doesn't support it
+    SYMLINK = 'symlink'
+    REFERENCE = 'reference'  # Data is left where it is, only metadata is written
+
+
+def _reflink(source: Path, dest: Path):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, 'reflink not supported')
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def place_file(source: Path, dest: Path, placement: Placement = Placement.COPY):
+    """
+    Place source at dest. Hard links and reflinks fall back to a copy where they are not possible (e.g.: across
+    filesystems). dest is replaced atomically if it exists, and left alone if it is already source.
+    """
+    placement = Placement(placement)
+    source, dest = Path(source), Path(dest)
+    if placement is Placement.REFERENCE or (dest.exists() and dest.samefile(source)):
+        return
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_path(dest) as tmp_path:
+        try:
+            if placement is Placement.SYMLINK:
+                os.symlink(source.resolve(), tmp_path)
+            elif placement is Placement.HARDLINK:
+                os.link(source, tmp_path)
+            elif placement is Placement.REFLINK:
+                _reflink(source, tmp_path)
+            else:
+                shutil.copy(source, tmp_path)
+        except OSError as e:
+            if placement not in (Placement.HARDLINK, Placement.REFLINK) or e.errno not in _UNSUPPORTED:
+                raise
+            tmp_path.unlink(missing_ok=True)
+            shutil.copy(source, tmp_path)
+
+
+def _is_local(entity) -> bool:
+    return isinstance(entity, (File, Dataset)) and entity.source is not None and \
+        isinstance(entity.source, (str, Path)) and not is_url(str(entity.source))
+
+
+def _unlisted(crate: ROCrate, top: Path, base_path: Path) -> Iterator[tuple[Path, Path]]:
+    """(source, dest) of files under top not listed as entities of their own, as in ROCrate._copy_unlisted"""
+    for root, dirs, files in walk(top, exclude=crate.exclude):
+        root = Path(root)
+        for name in files:
+            if name == MANIFEST_NAME:
+                continue
+            source = root / name
+            rel = source.relative_to(top)
+            if not crate.dereference(str(rel)):
+                yield source, base_path / rel
+
+
+def data_placements(crate: ROCrate, base_path: Path) -> Iterator[tuple[Path, Path]]:
+    """(source, dest) of every local data file written with the crate to base_path"""
+    base_path = Path(base_path)
+    if crate.source:
+        yield from _unlisted(crate, Path(crate.source), base_path)
+    for entity in crate.data_entities:
+        if not _is_local(entity):
+            continue
+        if isinstance(entity, File):
+            yield Path(entity.source), base_path / entity.id
+        elif not crate.source:
+            yield from _unlisted(crate, Path(entity.source), base_path / entity.id)
+
+
+def _without_date_published(item: dict) -> dict:
+    return {k: v for k, v in item.items() if k != 'datePublished'}
+
+
+def _remove_placed(dest: Path, signature: list):
+    """Remove a file placed by an earlier write (see file_signature), unless it is its own source"""
+    if os.path.abspath(signature[0]) != os.path.abspath(dest):
+        dest.unlink(missing_ok=True)
+
+
+def write_crate(crate: ROCrate, base_path: Path, placement: Placement = Placement.COPY,
+                max_workers: int | None = None, extra_entities: list[dict] | None = None, compact: bool = False,
+                incremental: bool = False):
+    """
+    Write crate to base_path like ROCrate.write, placing local data files with the given strategy. Files are placed
+    in parallel (copies release the GIL), while remote and in-memory entities are written by rocrate. With
+    Placement.REFERENCE, local files written elsewhere are kept by reference, recorded as contentUrl in the metadata
+    (but not set on the entities).
+
+    If extra_entities are given (see LpProvCrate(lean=True)), they are appended to the crate's own in the metadata,
+    which is streamed with write_jsonld (compact, without indentation, if compact). Otherwise rocrate writes it.
+
+    With incremental=True, a manifest of the graph digest and data file signatures is kept in base_path (see
+    CrateManifest), and only files whose source changed are placed, and the metadata only written if the graph changed.
+    Files placed by an earlier write, which are no longer in the crate, are removed. The root's datePublished is left
+    out of the comparison, as it is the time the crate was created by default (the metadata keeps that of the last
+    write that changed it). Random ids (e.g.: see LpProvCrate(deterministic_ids=True)) do change the graph.
+    """
+    placement = Placement(placement)
+    base_path = Path(base_path)
+    base_path.mkdir(parents=True, exist_ok=True)
+    manifest = CrateManifest(base_path) if incremental else None
+
+    references = {}  # contentUrl of entities kept by reference, by id
+    for entity in crate.data_entities:
+        if not _is_local(entity):
+            entity.write(base_path)
+        elif placement is Placement.REFERENCE:
+            source = Path(entity.source).resolve()
+            if source != (base_path / entity.id).resolve():
+                references[entity.id] = source.as_uri()
+        elif isinstance(entity, Dataset):
+            (base_path / entity.id).mkdir(parents=True, exist_ok=True)
+
+    files = {}
+    if placement is not Placement.REFERENCE:
+        pairs = []
+        for source, dest in data_placements(crate, base_path):
+            if manifest is not None:
+                key = dest.relative_to(base_path).as_posix()
+                files[key] = signature = file_signature(source, placement.value)
+                if manifest.unchanged_file(key, signature, dest):
+                    continue
+            pairs.append((source, dest))
+        with ThreadPoolExecutor(max_workers) as executor:
+            # Consume the results so that errors are raised
+            list(executor.map(lambda pair: place_file(*pair, placement), pairs))
+    if manifest is not None:
+        for key in manifest.files.keys() - files.keys():
+            _remove_placed(base_path / key, manifest.files[key])
+
+    streamed = extra_entities is not None
+    metadata = crate.metadata.generate() if streamed or references or manifest is not None else None
+    if references:
+        metadata['@graph'] = [{**item, 'contentUrl': references[item['@id']]} if item['@id'] in references else item
+                              for item in metadata['@graph']]
+    if manifest is not None:
+        root_id = crate.root_dataset.id
+        graph = (_without_date_published(item) if item['@id'] == root_id else item
+                 for item in itertools.chain(metadata['@graph'], extra_entities or ()))
+        # compact only applies to streamed metadata
+        digest = graph_digest(metadata['@context'], graph, streamed, streamed and compact)
+        if digest == manifest.graph and (base_path / crate.metadata.id).exists():
+            if files != manifest.files:
+                manifest.save(digest, files)
+            return
+
+    for entity in crate.default_entities:
+        if entity is crate.metadata and streamed:
+            graph = itertools.chain(metadata['@graph'], extra_entities)
+            write_jsonld(base_path / entity.id, graph, metadata['@context'], compact=compact)
+        elif entity is crate.metadata and references:
+            # As Metadata.write, with the references added
+            with atomic_path(base_path / entity.id) as tmp_path, open(tmp_path, 'x') as f:
+                json.dump(metadata, f, indent=4, sort_keys=True)
+        else:
+            entity.write(base_path)
+    if manifest is not None:
+        manifest.save(digest, files)
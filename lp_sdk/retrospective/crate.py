@@ -1,13 +1,44 @@
+import json
+import os
 from pathlib import Path
 
-from rocrate.model import ContextEntity
+from rocrate.model import ContextEntity, File
 from rocrate.rocrate import ROCrate
 
+from lp_sdk.provenance.placement import Placement, write_crate
+from lp_sdk.retrospective.file_info import FileDescriber, FileInfoCache
+
+# Records of a DistStepCrate in journal mode, in the crate directory
+JOURNAL_NAME = '.lp-step-journal.jsonl'
+
 
 class DistStepCrate:
-    def __init__(self, path: str):
+    """
+    The crate of a single step of a distributed workflow.
+
+    Files added with add_file(path, describe=True) are hashed on a thread pool of max_workers, with hashes cached in
+    file_info_cache (a FileInfoCache, shared between crates) if given, so unchanged files are not hashed again.
+
+    With journal=True, an existing crate is not loaded, and entities and files are not added to the crate but appended
+    as records to a journal (JOURNAL_NAME) in path, at constant cost however many have been recorded. The journal is
+    replayed into the crate, which is written, by compact once the step completes. Entities returned in journal mode
+    are not in the crate. The journal is kept open between records until close (or write/compact), or the end of a
+    with block.
+    """
+    def __init__(self, path: str, file_info_cache: FileInfoCache | None = None, max_workers: int | None = None,
+                 journal: bool = False):
         self.path = Path(path)
-        if (self.path / 'ro-crate-metadata.json').exists():
+        self.journal = journal
+        self._load()
+        self._describer = FileDescriber(file_info_cache, max_workers)
+        # Files being described, by id
+        self._pending_file_info = {}
+        self._journal_fd = None
+        # (path, describe) of files recorded in the journal
+        self._journaled_files = set()
+
+    def _load(self):
+        if (self.path / 'ro-crate-metadata.json').exists() and not self.journal:
             self.crate = ROCrate(self.path)
         else:
             self.crate = ROCrate()
@@ -25,8 +56,43 @@ class DistStepCrate:
 
         self.crate.mainEntity = entity
 
+    def _append(self, record: dict):
+        """
+        Append a record to the journal, as a single line written at once to the end of the file (O_APPEND), so that
+        records of processes sharing the journal don't interleave
+        """
+        line = json.dumps(record, separators=(',', ':')).encode() + b'\n'
+        if self._journal_fd is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            flags = os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+            fd = self._journal_fd = os.open(self.path / JOURNAL_NAME, flags, 0o666)
+            # Start a new line after a record cut short, when a task was interrupted
+            if os.lseek(fd, 0, os.SEEK_END):
+                os.lseek(fd, -1, os.SEEK_END)
+                if os.read(fd, 1) != b'\n':
+                    line = b'\n' + line
+        os.write(self._journal_fd, line)
+
+    def close(self):
+        """Close the journal, if open. It is reopened by the next record"""
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+            self._journal_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _add(self, entity: ContextEntity) -> ContextEntity:
+        if self.journal:
+            self._append({'add': entity.properties()})
+            return entity
+        return self.crate.add(entity)
+
     def add_position(self, task_id):
-        position = self.crate.add(
+        position = self._add(
             ContextEntity(
                 crate=self.crate,
                 properties={
@@ -34,11 +100,14 @@ class DistStepCrate:
                     'position': task_id
                 }))
 
-        self.crate.mainEntity['step'] = position
+        if self.journal:
+            self._append({'update': {'@id': self.crate.mainEntity.id, 'step': {'@id': position.id}}})
+        else:
+            self.crate.mainEntity['step'] = position
 
     def add_organize_action(self, id: str, name: str, properties: dict, agent: ContextEntity,
                             step_actions: list[ContextEntity], wf_action: ContextEntity):
-        return self.crate.add(ContextEntity(
+        return self._add(ContextEntity(
             self.crate,
             identifier=id, properties={
                 '@type': 'OrganizeAction',
@@ -51,7 +120,7 @@ class DistStepCrate:
         ))
 
     def add_control_action(self, id: str, name: str, create_action: ContextEntity):
-        return self.crate.add(ContextEntity(
+        return self._add(ContextEntity(
             self.crate,
             identifier=id, properties={
                 '@type': 'ControlAction',
@@ -61,7 +130,7 @@ class DistStepCrate:
         ))
 
     def add_create_action(self, id, properties):
-        return self.crate.add(ContextEntity(
+        return self._add(ContextEntity(
             self.crate,
             identifier=id, properties={
                 '@type': 'CreateAction',
@@ -70,7 +139,7 @@ class DistStepCrate:
         ))
 
     def add_agent(self, id, name):
-        return self.crate.add(ContextEntity(
+        return self._add(ContextEntity(
             self.crate,
             identifier=id, properties={
                 '@type': 'Person',
@@ -79,7 +148,7 @@ class DistStepCrate:
         ))
 
     def add_property(self, id, name, value):
-        return self.crate.add(ContextEntity(
+        return self._add(ContextEntity(
             self.crate,
             identifier=id, properties={
                 '@type': 'PropertyValue',
@@ -88,13 +157,76 @@ class DistStepCrate:
             }
         ))
 
-    def add_file(self, path: str):
+    def add_file(self, path: str, describe: bool = False):
+        """
+        Add a file, relative to the crate. With describe=True, its sha256, contentSize and encodingFormat are added
+        once computed (in the background), see wait_file_info
+        """
+        if self.journal:
+            if (path, describe) not in self._journaled_files:
+                self._append({'file': str(path), 'describe': describe})
+                self._journaled_files.add((path, describe))
+            return File(self.crate, self.path / path)
+
         if path in self.files:
-            return self.files[path]
+            file = self.files[path]
         else:
             file = self.crate.add_file(self.path / path)
             self.files[path] = file
-            return file
+        if describe and 'sha256' not in file and file.id not in self._pending_file_info:
+            self._pending_file_info[file.id] = (file, self._describer.submit(self.path / path))
+        return file
+
+    def wait_file_info(self):
+        """Wait for files being described, and add their properties"""
+        self._describer.wait()
+        pending, self._pending_file_info = self._pending_file_info, {}
+        for file, future in pending.values():
+            file.properties().update(future.result())
+
+    def write(self, placement: Placement = Placement.COPY, max_workers: int | None = None, incremental: bool = False):
+        """
+        Write the crate to path, placing data files with the given strategy. With incremental=True, only what changed
+        since the last write is rewritten, see write_crate. In journal mode, the journal is compacted (see compact), as
+        the crate holds none of the recorded entities, nor those of the existing crate.
+        """
+        if self.journal:
+            self.compact(placement, max_workers, incremental)
+            return
+        self.close()
+        self.wait_file_info()
+        write_crate(self.crate, self.path, placement, max_workers, incremental=incremental)
+
+    def compact(self, placement: Placement = Placement.COPY, max_workers: int | None = None,
+                incremental: bool = False):
+        """
+        Replay the journal (see DistStepCrate(journal=True)) into the crate, loading the existing crate in path if any,
+        write it, and remove the journal. The crate is no longer in journal mode afterwards.
+        """
+        self.close()
+        journal_path = self.path / JOURNAL_NAME
+        try:
+            with open(journal_path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+
+        self.journal = False
+        self._journaled_files.clear()
+        self._load()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A record cut short when a task was interrupted
+            if 'add' in record:
+                properties = dict(record['add'])
+                self.crate.add(ContextEntity(self.crate, properties.pop('@id'), properties))
+            elif 'update' in record:
+                properties = dict(record['update'])
+                self.crate.get(properties.pop('@id')).properties().update(properties)
+            else:
+                self.add_file(record['file'], record['describe'])
 
-    def write(self):
-        self.crate.write(self.path)
+        self.write(placement, max_workers, incremental)
+        journal_path.unlink(missing_ok=True)
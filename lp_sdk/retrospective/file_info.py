@@ -0,0 +1,107 @@
+import hashlib
+import mimetypes
+import mmap
+import os
+import pathlib
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Hashed a slice at a time, hashlib releases the GIL while hashing each
+_CHUNK_SIZE = 64 * 1024 * 1024
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS file_info (
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (device, inode, size, mtime_ns)
+);
+'''
+
+
+def sha256_file(path: str | pathlib.Path) -> str:
+    """sha256 of a file, read in a single pass over a memory map of it"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return h.hexdigest()  # Empty files can't be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if hasattr(m, 'madvise'):
+                m.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(m) as view:
+                for offset in range(0, len(view), _CHUNK_SIZE):
+                    h.update(view[offset:offset + _CHUNK_SIZE])
+    return h.hexdigest()
+
+
+class FileInfoCache:
+    """
+    Persistent SQLite cache of file hashes, keyed by (device, inode, size, mtime), so a file is only hashed again once
+    it changes. Safe to share between threads. db_path defaults to an in-memory cache.
+    """
+    def __init__(self, db_path: str | pathlib.Path = ':memory:'):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT sha256 FROM file_info WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?', key
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: tuple, sha256: str):
+        with self._lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO file_info VALUES (?, ?, ?, ?, ?)', (*key, sha256))
+
+
+def file_info(path: str | pathlib.Path, cache: FileInfoCache | None = None) -> dict:
+    """
+    The sha256, contentSize and encodingFormat (guessed from the file name, omitted if unknown) of a file. The hash is
+    looked up in (and added to) cache if given.
+    """
+    st = os.stat(path)
+    key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    sha256 = cache.get(key) if cache is not None else None
+    if sha256 is None:
+        sha256 = sha256_file(path)
+        if cache is not None:
+            cache.put(key, sha256)
+
+    info = {'sha256': sha256, 'contentSize': str(st.st_size)}
+    encoding_format, _ = mimetypes.guess_type(str(path))
+    if encoding_format:
+        info['encodingFormat'] = encoding_format
+    return info
+
+
+class FileDescriber:
+    """Computes file_info on a thread pool, started on first use and stopped by wait"""
+    def __init__(self, cache: FileInfoCache | None = None, max_workers: int | None = None):
+        self.cache = cache
+        self.max_workers = max_workers
+        self._executor = None
+
+    def submit(self, path: str | pathlib.Path) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor.submit(file_info, path, self.cache)
+
+    def wait(self):
+        """Wait for submitted files, and stop the thread pool"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,27 @@
+import json
+from functools import partial
+from pathlib import Path
+
+import pytest
+
+from lp_sdk.parser.globus_prospective import parse_globus_wep
+
+GLOBUS_PROV = Path(__file__).parent / 'data' / 'globus_prov'
+
+
+@pytest.fixture
+def input_data():
+    with open(GLOBUS_PROV / 'input.json') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def wep_data():
+    with open(GLOBUS_PROV / 'WEP.json') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def globus_wep_parser(input_data):
+    """parse_globus_wep for the globus_prov WEP and input, as passed to LpProvCrate.build_from_wep"""
+    return partial(parse_globus_wep, input_=input_data, orch_epid='b782400e-3e59-412c-8f73-56cd0782301f')
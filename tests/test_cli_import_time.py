@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+import pytest
+
+# Heavy dependencies that the CLI (and package __init__s) must only import when a command needs them
+HEAVY_MODULES = ['rocrate', 'runcrate', 'gladier', 'pydantic']
+
+# Cumulative import time budget for lp_sdk.parser.cli, in microseconds (-X importtime units).
+# Currently ~40ms, importing rocrate alone adds ~140ms
+IMPORT_BUDGET_US = 120_000
+
+
+def _run(code: str, *args) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args, '-c', code], capture_output=True, text=True, check=True)
+
+
+@pytest.mark.parametrize('module', ['lp_sdk.parser.cli', 'lp_sdk.provenance', 'lp_sdk.gladier'])
+def test_no_heavy_imports(module):
+    result = _run(f'import sys, {module}; print(" ".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+    assert result.stdout.strip() == '', f'{module} imports {result.stdout.strip()}'
+
+
+def test_cli_import_time():
+    # Best of a few runs, to reduce noise
+    timings = []
+    for _ in range(3):
+        result = _run('import lp_sdk.parser.cli', '-X', 'importtime')
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            _, cumulative, name = line.split('|')
+            if name.strip() == 'lp_sdk.parser.cli':
+                timings.append(int(cumulative))
+
+    assert min(timings) < IMPORT_BUDGET_US, f'lp_sdk.parser.cli import took {min(timings)}us'
+
+
+def test_lazy_exports():
+    from lp_sdk.provenance import LpProvCrate
+    from lp_sdk.provenance.crate import LpProvCrate as _LpProvCrate
+    assert LpProvCrate is _LpProvCrate
+
+    import lp_sdk.provenance
+    # The module __getattr__ raises AttributeError for unknown names
+    assert not hasattr(lp_sdk.provenance, 'NotAThing')
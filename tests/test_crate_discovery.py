@@ -0,0 +1,111 @@
+import tempfile
+from pathlib import Path
+
+from click.testing import CliRunner
+from rocrate.rocrate import ROCrate
+
+from lp_sdk.parser.cli import list_outputs, list_subcrates
+from lp_sdk.parser.crate import CrateView, find_crate_roots, get_crates
+
+
+def _make_tree(root: Path):
+    """
+    Build a publication directory:
+      root/                  (publication crate)
+        step_b/              (step crate, with a nested crate in its payload)
+          payload/nested/
+        step_a/              (step crate)
+        data/step_c/         (step crate, below a plain directory)
+        scratch/step_d/      (step crate, to be ignored)
+    """
+    for sub in ['', 'step_b', 'step_b/payload/nested', 'step_a', 'data/step_c', 'scratch/step_d']:
+        d = root / sub
+        d.mkdir(parents=True, exist_ok=True)
+        crate = ROCrate()
+        crate.name = sub or 'root'
+        crate.write(d)
+
+
+def test_find_crate_roots_prunes_payload():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        _make_tree(d)
+
+        found = {p.relative_to(d).as_posix() for p in find_crate_roots(d)}
+        assert found == {'.', 'step_a', 'step_b', 'data/step_c', 'scratch/step_d'}
+
+        found = {p.relative_to(d).as_posix() for p in find_crate_roots(d, prune=False)}
+        assert 'step_b/payload/nested' in found
+
+        found = {p.relative_to(d).as_posix() for p in find_crate_roots(d, ignore=['scratch'])}
+        assert found == {'.', 'step_a', 'step_b', 'data/step_c'}
+
+        found = {p.relative_to(d).as_posix() for p in find_crate_roots(d, ignore=['data/*'])}
+        assert found == {'.', 'step_a', 'step_b', 'scratch/step_d'}
+
+
+def test_get_crates_ordering():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        _make_tree(d)
+
+        expected = sorted(str(p) for p in find_crate_roots(d))
+        for workers in [1, 4]:
+            names = list(get_crates(d, workers=workers, ordered=True, loader=str))
+            assert names == expected
+
+            # Discovery order matches the serial walk
+            names = list(get_crates(d, workers=workers, loader=str))
+            assert names == [str(p) for p in find_crate_roots(d)]
+
+        crates = list(get_crates(d, workers=2, ordered=True))
+        assert [c.name for c in crates] == ['root', 'data/step_c', 'scratch/step_d', 'step_a', 'step_b']
+
+
+def test_list_subcrates():
+    runner = CliRunner()
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        _make_tree(d)
+
+        result = runner.invoke(list_subcrates, [str(d), '--sort', '--ignore', 'scratch', '-j', '2'])
+        assert result.exit_code == 0
+        assert result.output.split() == ['root', 'data/step_c', 'step_a', 'step_b']
+
+
+def test_crate_view_matches_rocrate():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        crate = ROCrate()
+        crate.name = 'step'
+        (d / 'output').mkdir()
+        for fname in ['output/a.txt', 'output/b.txt', 'input.txt']:
+            (d / fname).write_text(fname)
+            crate.add_file(d / fname, fname)
+        crate.write(d)
+
+        full = ROCrate(str(d))
+        view = CrateView(str(d))
+
+    assert view.name == full.name == 'step'
+    assert view.root_dataset['@id'] == './'
+    assert sorted(f['@id'] for f in view.get_by_type('File')) == sorted(f.id for f in full.get_by_type('File'))
+    assert view.get('output/a.txt')['@type'] == 'File'
+    assert view.get('missing') is None
+
+
+def test_list_outputs():
+    runner = CliRunner()
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        crate = ROCrate()
+        crate.name = 'step'
+        (d / 'output').mkdir()
+        for fname in ['output/a.txt', 'input.txt']:
+            (d / fname).write_text(fname)
+            crate.add_file(d / fname, fname)
+        crate.write(d)
+
+        result = runner.invoke(list_outputs, [str(d)])
+        assert result.exit_code == 0
+        assert result.output.split() == ['step', 'output/a.txt']
@@ -0,0 +1,112 @@
+import os
+import tempfile
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from lp_sdk.parser.cli import cli
+from lp_sdk.parser.index import CrateIndex
+from lp_sdk.retrospective.crate import DistStepCrate
+
+
+def _make_step_crate(path: Path, outputs: list[str]):
+    path.mkdir(parents=True)
+    crate = DistStepCrate(path)
+    crate.crate.name = path.name
+    (path / 'output').mkdir()
+    for fname in outputs:
+        (path / fname).write_text(fname)
+        crate.crate.add_file(path / fname, fname)
+    crate.add_property('#pv-reverse', 'reverse', 'True')
+    crate.write()
+
+
+def test_index_incremental():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        _make_step_crate(d / 'step_a', ['output/a.txt'])
+        _make_step_crate(d / 'step_b', ['output/b.txt', 'output/c.txt'])
+
+        with CrateIndex(d / 'index.sqlite') as index:
+            stats = index.update(d)
+            assert (stats.added, stats.updated, stats.removed, stats.unchanged) == (2, 0, 0, 0)
+
+            assert [(name, f) for _, name, f in index.outputs()] == [
+                ('step_a', 'output/a.txt'), ('step_b', 'output/b.txt'), ('step_b', 'output/c.txt')]
+            assert [name for _, name in index.crates_with_entity('output/c.txt')] == ['step_b']
+            assert [name for _, name in index.crates_with_entity('#pv-reverse')] == ['step_a', 'step_b']
+            assert [name for _, name in index.crates_of_type('CreateAction')] == ['step_a', 'step_b']
+            assert index.crates_of_type('Person') == []
+
+            # Nothing changed, nothing re-parsed
+            stats = index.update(d)
+            assert (stats.added, stats.updated, stats.removed, stats.unchanged) == (0, 0, 0, 2)
+
+            # Modify one crate, remove another, add a third
+            metadata = d / 'step_a' / 'ro-crate-metadata.json'
+            metadata.write_text(metadata.read_text().replace('output/a.txt', 'output/z.txt'))
+            st = metadata.stat()
+            os.utime(metadata, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+            (d / 'step_b' / 'ro-crate-metadata.json').unlink()
+            _make_step_crate(d / 'step_c', ['output/d.txt'])
+
+            stats = index.update(d)
+            assert (stats.added, stats.updated, stats.removed, stats.unchanged) == (1, 1, 1, 0)
+            assert [(name, f) for _, name, f in index.outputs()] == [
+                ('step_a', 'output/z.txt'), ('step_c', 'output/d.txt')]
+
+        # Index persists between sessions
+        with CrateIndex(d / 'index.sqlite') as index:
+            assert [name for _, name in index.crates_with_entity('output/d.txt')] == ['step_c']
+
+
+def test_index_unparsable_crate(tmp_path):
+    _make_step_crate(tmp_path / 'step_a', ['output/a.txt'])
+    _make_step_crate(tmp_path / 'step_b', ['output/b.txt'])
+    metadata = tmp_path / 'step_b' / 'ro-crate-metadata.json'
+    valid = metadata.read_text()
+    metadata.write_text('{"@graph": [')
+
+    with CrateIndex(tmp_path / 'index.sqlite') as index:
+        for workers in (1, 4):
+            stats = index.update(tmp_path, workers=workers)
+            assert (stats.added, stats.updated, stats.failed) == ((1, 0, 1) if workers == 1 else (0, 0, 1))
+            assert [(path, error.split(':')[0]) for path, error in stats.errors] == [
+                (str(tmp_path / 'step_b'), 'JSONDecodeError')]
+            assert [name for _, name in index.crates_of_type('CreateAction')] == ['step_a']
+
+        # Parsed again once fixed, and dropped from the index if it breaks again
+        metadata.write_text(valid)
+        stats = index.update(tmp_path)
+        assert (stats.added, stats.failed, stats.unchanged) == (1, 0, 1)
+        metadata.write_text(valid.replace('"@id"', '"@id', 1))
+        stats = index.update(tmp_path)
+        assert (stats.updated, stats.failed) == (0, 1)
+        assert [name for _, name in index.crates_of_type('CreateAction')] == ['step_a']
+
+    result = CliRunner().invoke(cli, ['index', str(tmp_path), '--db', str(tmp_path / 'cli.sqlite')])
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines()[-1] == 'added: 1, updated: 0, removed: 0, unchanged: 0, failed: 1'
+
+
+def test_index_cli():
+    runner = CliRunner()
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        _make_step_crate(d / 'step_a', ['output/a.txt'])
+
+        result = runner.invoke(cli, ['index', str(d)])
+        assert result.exit_code == 0, result.output
+        assert result.output.strip() == 'added: 1, updated: 0, removed: 0, unchanged: 0, failed: 0'
+
+        result = runner.invoke(cli, ['query', 'outputs', str(d)])
+        assert result.exit_code == 0, result.output
+        assert result.output.split() == ['step_a', 'output/a.txt']
+
+        result = runner.invoke(cli, ['query', 'entity', str(d), 'output/a.txt'])
+        assert result.exit_code == 0, result.output
+        assert result.output.split()[0] == 'step_a'
+
+        result = runner.invoke(cli, ['query', 'type', str(d), 'Schedule'])
+        assert result.exit_code == 0, result.output
+        assert result.output.split()[0] == 'step_a'
@@ -0,0 +1,61 @@
+import hashlib
+import json
+
+import pytest
+
+from lp_sdk.retrospective import file_info as file_info_module
+from lp_sdk.retrospective.crate import DistStepCrate
+from lp_sdk.retrospective.file_info import FileInfoCache, file_info, sha256_file
+
+
+@pytest.mark.parametrize('size', [0, 1, 10, 16, 33])
+def test_sha256_file(tmp_path, monkeypatch, size):
+    monkeypatch.setattr(file_info_module, '_CHUNK_SIZE', 16)
+    data = bytes(range(size))
+    (tmp_path / 'data.bin').write_bytes(data)
+    assert sha256_file(tmp_path / 'data.bin') == hashlib.sha256(data).hexdigest()
+
+
+def test_file_info_cache(tmp_path, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(file_info_module, 'sha256_file', lambda path: hashed.append(path) or sha256_file(path))
+    path = tmp_path / 'result.json'
+    path.write_text('{}')
+    expected = {'sha256': hashlib.sha256(b'{}').hexdigest(), 'contentSize': '2', 'encodingFormat': 'application/json'}
+
+    with FileInfoCache(tmp_path / 'cache.sqlite') as cache:
+        assert file_info(path, cache) == expected
+        assert file_info(path, cache) == expected
+    assert len(hashed) == 1
+
+    # The cache persists, and changed files are hashed again
+    with FileInfoCache(tmp_path / 'cache.sqlite') as cache:
+        assert file_info(path, cache) == expected
+        assert len(hashed) == 1
+        path.write_text('[1]')
+        assert file_info(path, cache)['sha256'] == hashlib.sha256(b'[1]').hexdigest()
+    assert len(hashed) == 2
+
+    (tmp_path / 'result.unknown-ext').write_text('')
+    assert 'encodingFormat' not in file_info(tmp_path / 'result.unknown-ext')
+
+
+def test_step_crate_describe(tmp_path):
+    for i in range(4):
+        (tmp_path / f'{i}.txt').write_text(str(i) * i)
+    cache = FileInfoCache()
+    crate = DistStepCrate(tmp_path, file_info_cache=cache, max_workers=2)
+    for i in range(4):
+        crate.add_file(f'{i}.txt', describe=True)
+    crate.add_file('0.txt', describe=True)
+    (tmp_path / 'extra.txt').write_text('extra')
+    crate.add_file('extra.txt')
+    crate.write()
+
+    with open(tmp_path / 'ro-crate-metadata.json') as f:
+        graph = {e['@id']: e for e in json.load(f)['@graph']}
+    for i in range(4):
+        assert graph[f'{i}.txt']['sha256'] == hashlib.sha256((str(i) * i).encode()).hexdigest()
+        assert graph[f'{i}.txt']['contentSize'] == str(i)
+        assert graph[f'{i}.txt']['encodingFormat'] == 'text/plain'
+    assert 'sha256' not in graph['extra.txt']
@@ -0,0 +1,54 @@
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from lp_sdk.parser.jsonld import write_jsonld
+from lp_sdk.parser.prospective import load_wep, parse_wep_to_rocrate
+
+TEST_DIR = Path(__file__).parent
+
+
+def _graphs():
+    yield []
+    yield [{'@id': 'a', '@type': 'File'}]
+    yield parse_wep_to_rocrate(load_wep(TEST_DIR / 'data' / 'WEP.json'))['@graph']
+    with open(TEST_DIR / 'data' / 'cwl_prov' / 'ro-crate-metadata.json') as f:
+        yield json.load(f)['@graph']
+
+
+@pytest.mark.parametrize('graph', list(_graphs()))
+def test_write_jsonld_matches_json_dump(graph):
+    """Indented output should be byte-identical to json.dump(indent=2)"""
+    data = {'@context': 'https://w3id.org/ro/crate/1.1/context', '@graph': graph}
+    with tempfile.TemporaryDirectory() as d:
+        expected = Path(d) / 'expected.json'
+        with open(expected, 'w') as f:
+            json.dump(data, f, indent=2)
+
+        actual = Path(d) / 'actual.json'
+        write_jsonld(actual, iter(graph), data['@context'])
+        assert actual.read_text() == expected.read_text()
+
+        compact = Path(d) / 'compact.json'
+        write_jsonld(compact, iter(graph), data['@context'], compact=True)
+        assert json.loads(compact.read_text()) == data
+        assert len(compact.read_text().splitlines()) == (len(graph) + 2 if graph else 1)
+
+
+def test_write_jsonld_is_atomic():
+    def _failing_graph():
+        yield {'@id': 'a', '@type': 'File'}
+        raise RuntimeError('failed to build graph')
+
+    with tempfile.TemporaryDirectory() as d:
+        out = Path(d) / 'ro-crate-metadata.json'
+        out.write_text('previous')
+
+        with pytest.raises(RuntimeError):
+            write_jsonld(out, _failing_graph())
+
+        # Previous file untouched, no temporary files left behind
+        assert out.read_text() == 'previous'
+        assert [p.name for p in Path(d).iterdir()] == ['ro-crate-metadata.json']
@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from lp_sdk.parser.lazy_input import (
+    JsonScanError,
+    load_input,
+    parse_states_from_file,
+    select_json,
+)
+from lp_sdk.parser.wep_parsing import PathLookupError, compile_path, parse_states
+
+DATA = Path(__file__).parent / 'data' / 'globus_prov'
+
+
+def test_select_json():
+    doc = {
+        'input': {'a': 1, 'b': {'c': 'x [ { "', 'd': [1, {'e': None}]}, 'big': {'payload': ['ignored'] * 10}},
+        'list': [{'id': 'zero'}, {'id': 'one'}],
+        'escaped\\"key': True,
+    }
+    buf = json.dumps(doc, indent=2).encode()
+    paths = ['$.input.a', '$.input.b.c', '$.input.b.d[1].e', '$.list[1].id', '$.input.missing']
+    selected = select_json(buf, paths)
+    assert selected == {
+        'input': {'a': 1, 'b': {'c': 'x [ { "', 'd': {1: {'e': None}}}},
+        'list': {1: {'id': 'one'}},
+    }
+    for path in paths[:-1]:
+        assert compile_path(path)(selected) == compile_path(path)(doc)
+    with pytest.raises(PathLookupError):
+        compile_path('$.input.missing')(selected)
+
+    # Prefixes select the whole value
+    assert select_json(buf, ['$.input.b', '$.input.b.c']) == {'input': {'b': doc['input']['b']}}
+    assert select_json(buf, ['$']) == doc
+    assert select_json(json.dumps(doc).encode(), ['$.escaped\\"key']) == {'escaped\\"key': True}
+
+
+@pytest.mark.parametrize('buf', [b'{"a": {"b": 1}', b'{"a" 1}', b'{"a": 1} x', b'{"a": [1, 2}', b'{"a": tru}'])
+def test_select_json_invalid(buf):
+    with pytest.raises(JsonScanError):
+        select_json(buf, ['$.a'])
+
+
+def test_parse_states_from_file(tmp_path):
+    with open(DATA / 'WEP.json') as f:
+        wep = json.load(f)
+    with open(DATA / 'input.json') as f:
+        flow_input = json.load(f)
+
+    # An unreferenced payload, which is never decoded
+    flow_input['input']['unused'] = {'data': list(range(1000))}
+    input_path = tmp_path / 'input.json'
+    input_path.write_text(json.dumps(flow_input))
+
+    assert parse_states_from_file(wep, input_path) == parse_states(wep, flow_input)
+    assert 'unused' not in load_input(input_path, ['$.input.compute_endpoint'])['input']
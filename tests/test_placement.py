@@ -0,0 +1,174 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+from rocrate.rocrate import ROCrate
+
+from lp_sdk.provenance.manifest import MANIFEST_NAME
+from lp_sdk.provenance.placement import Placement, place_file, write_crate
+from lp_sdk.retrospective.crate import DistStepCrate
+
+
+def _make_crate(src: Path) -> ROCrate:
+    (src / 'tree' / 'sub').mkdir(parents=True)
+    (src / 'a.txt').write_text('a')
+    (src / 'tree' / 'b.txt').write_text('b')
+    (src / 'tree' / 'sub' / 'c.txt').write_text('c')
+    crate = ROCrate()
+    crate.add_file(src / 'a.txt', 'data/a.txt')
+    crate.add_dataset(src / 'tree')
+    return crate
+
+
+@pytest.mark.parametrize('placement', list(Placement))
+def test_write_crate(tmp_path, placement):
+    crate = _make_crate(tmp_path / 'src')
+    out = tmp_path / 'out'
+    write_crate(crate, out, placement)
+
+    with open(out / 'ro-crate-metadata.json') as f:
+        graph = {e['@id']: e for e in json.load(f)['@graph']}
+    files = [out / 'data' / 'a.txt', out / 'tree' / 'b.txt', out / 'tree' / 'sub' / 'c.txt']
+    if placement is Placement.REFERENCE:
+        assert not any(f.exists() for f in files)
+        assert graph['data/a.txt']['contentUrl'] == (tmp_path / 'src' / 'a.txt').as_uri()
+        assert graph['tree/']['contentUrl'] == (tmp_path / 'src' / 'tree').as_uri()
+        # The reference is only in the written metadata, so a later write with another placement doesn't have it
+        assert 'contentUrl' not in crate.get('data/a.txt')
+        write_crate(crate, out, Placement.COPY)
+        with open(out / 'ro-crate-metadata.json') as f:
+            assert all('contentUrl' not in e for e in json.load(f)['@graph'])
+        return
+
+    assert [f.read_text() for f in files] == ['a', 'b', 'c']
+    assert 'contentUrl' not in graph['data/a.txt']
+    source = tmp_path / 'src' / 'a.txt'
+    assert files[0].is_symlink() == (placement is Placement.SYMLINK)
+    assert files[0].samefile(source) == (placement in (Placement.HARDLINK, Placement.SYMLINK))
+
+    # Rewriting replaces the placed files, and leaves no temporary files behind
+    source.write_text('A')
+    write_crate(crate, out, placement)
+    assert files[0].read_text() == 'A'
+    assert not list(out.rglob('*.tmp'))
+
+
+def test_write_crate_matches_rocrate(tmp_path):
+    for out in ('rocrate', 'placed'):
+        crate = _make_crate(tmp_path / out / 'src')
+        crate.root_dataset['datePublished'] = '2024-01-01T00:00:00'
+        if out == 'rocrate':
+            crate.write(tmp_path / out / 'crate')
+        else:
+            write_crate(crate, tmp_path / out / 'crate', Placement.COPY, max_workers=2)
+
+    def _tree(root):
+        return {str(p.relative_to(root)): p.read_text() for p in root.rglob('*') if p.is_file()}
+
+    rocrate_tree = _tree(tmp_path / 'rocrate' / 'crate')
+    assert rocrate_tree == _tree(tmp_path / 'placed' / 'crate')
+    assert len(rocrate_tree) == 4
+
+
+def test_place_file_fallback(tmp_path, monkeypatch):
+    """Hard links and reflinks fall back to a copy where they aren't supported, while other errors are raised"""
+    source = tmp_path / 'source.txt'
+    source.write_text('data')
+
+    def _no_link(src, dst):
+        raise OSError(18, 'Invalid cross-device link')
+    monkeypatch.setattr('os.link', _no_link)
+    place_file(source, tmp_path / 'linked.txt', Placement.HARDLINK)
+    assert (tmp_path / 'linked.txt').read_text() == 'data'
+    assert not (tmp_path / 'linked.txt').samefile(source)
+
+    place_file(source, tmp_path / 'cloned.txt', 'reflink')
+    assert (tmp_path / 'cloned.txt').read_text() == 'data'
+
+    with pytest.raises(FileNotFoundError):
+        place_file(tmp_path / 'missing.txt', tmp_path / 'out.txt', Placement.REFLINK)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['cloned.txt', 'linked.txt', 'source.txt']
+
+
+def test_step_crate_placement(tmp_path):
+    outputs = tmp_path / 'outputs'
+    outputs.mkdir()
+    (outputs / 'result.txt').write_text('result')
+
+    crate = DistStepCrate(tmp_path / 'step')
+    crate.crate.add_file(outputs / 'result.txt')
+    crate.write(Placement.HARDLINK)
+    assert (tmp_path / 'step' / 'result.txt').samefile(outputs / 'result.txt')
+
+
+def _rewritten(paths: list[Path]) -> list[bool]:
+    """Which of paths were written since the last call, which marks them by resetting their mtime"""
+    rewritten = [p.stat().st_mtime_ns != 0 for p in paths]
+    for p in paths:
+        os.utime(p, ns=(0, 0))
+    return rewritten
+
+
+def test_write_crate_incremental(tmp_path):
+    crate = _make_crate(tmp_path / 'src')
+    out = tmp_path / 'out'
+    placed = [out / 'ro-crate-metadata.json', out / 'data' / 'a.txt', out / 'tree' / 'b.txt']
+
+    write_crate(crate, out, incremental=True)
+    assert (out / MANIFEST_NAME).exists()
+    assert _rewritten(placed) == [True, True, True]
+
+    # Nothing changed, nothing is rewritten
+    write_crate(crate, out, incremental=True)
+    assert _rewritten(placed) == [False, False, False]
+
+    # Only the changed file is placed
+    (tmp_path / 'src' / 'tree' / 'b.txt').write_text('changed')
+    write_crate(crate, out, incremental=True)
+    assert _rewritten(placed) == [False, False, True]
+    assert placed[2].read_text() == 'changed'
+
+    # Only the metadata is rewritten when the graph changes
+    crate.root_dataset['name'] = 'renamed'
+    write_crate(crate, out, incremental=True)
+    assert _rewritten(placed) == [True, False, False]
+    with open(placed[0]) as f:
+        assert any(e.get('name') == 'renamed' for e in json.load(f)['@graph'])
+
+    # Missing outputs are replaced, as is everything when the placement changes
+    placed[1].unlink()
+    write_crate(crate, out, incremental=True)
+    assert placed[1].read_text() == 'a'
+    write_crate(crate, out, Placement.HARDLINK, incremental=True)
+    assert placed[2].samefile(tmp_path / 'src' / 'tree' / 'b.txt')
+
+    # Files of entities no longer in the crate are removed
+    crate.delete(crate.get('data/a.txt'))
+    write_crate(crate, out, incremental=True)
+    assert not placed[1].exists() and placed[2].exists()
+    assert (tmp_path / 'src' / 'a.txt').exists()
+
+
+def test_step_crate_incremental(tmp_path):
+    crate = DistStepCrate(tmp_path)
+    (tmp_path / 'result.txt').write_text('result')
+    crate.add_file('result.txt')
+    crate.write(incremental=True)
+    metadata = tmp_path / 'ro-crate-metadata.json'
+    assert _rewritten([metadata]) == [True]
+
+    crate.write(incremental=True)
+    assert _rewritten([metadata]) == [False]
+    crate.add_property('#pv-reverse', 'reverse', 'True')
+    crate.write(incremental=True)
+    assert _rewritten([metadata]) == [True]
+
+    # The manifest is not part of the crate
+    assert MANIFEST_NAME not in metadata.read_text()
+
+    # Files in the crate directory are their own source, so are kept when no longer in the crate
+    crate.crate.delete(crate.crate.get('result.txt'))
+    crate.write(incremental=True)
+    assert 'result.txt' not in metadata.read_text()
+    assert (tmp_path / 'result.txt').exists()
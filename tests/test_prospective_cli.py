@@ -1,9 +1,14 @@
 import json
+import shutil
+import subprocess
+import sys
 import tempfile
 from pathlib import Path
 
+import pytest
 from click.testing import CliRunner
 
+from lp_sdk.parser import prospective as _prospective
 from lp_sdk.parser.cli import prospective
 
 TEST_DIR = Path(__file__).parent
@@ -36,3 +41,115 @@ def test_prospective():
     item_ids = [item['@id'] for item in result['@graph']]
     for item in wep['States'].keys():
         assert item in item_ids
+
+
+def test_stream_wep_to_rocrate():
+    with open(TEST_DIR / 'data' / 'WEP.json') as f:
+        wep = json.load(f)
+
+    streamed = _prospective.stream_wep_to_rocrate(wep)
+    assert not isinstance(streamed['@graph'], list)
+
+    graph = list(_prospective.iter_validated(streamed['@graph']))
+    assert graph == _prospective.parse_wep_to_rocrate(wep)['@graph']
+
+    with pytest.raises(ValueError, match='missing @type'):
+        list(_prospective.iter_validated([{'@id': 'missing type'}]))
+
+
+def test_validate_streamed_rocrate():
+    with open(TEST_DIR / 'data' / 'WEP.json') as f:
+        wep = json.load(f)
+
+    report = _prospective.validate_rocrate(_prospective.stream_wep_to_rocrate(wep))
+    assert report.valid, str(report)
+
+    streamed = _prospective.stream_wep_to_rocrate(wep)
+    streamed['@graph'] = (item for item in [*streamed['@graph'], {'@id': 'Extra'}])
+    assert [p.message for p in _prospective.validate_rocrate(streamed).problems] == ['missing @type']
+    assert [str(p) for p in _prospective.validate_rocrate({'@context': 'ctx', '@graph': 'a'}).problems] == [
+        '@graph is str, expected list']
+
+
+def test_prospective_batch():
+    runner = CliRunner()
+    in_file = TEST_DIR / 'data' / 'WEP.json'
+
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        in_dir = d / 'weps'
+        in_dir.mkdir()
+        for name in ['a', 'b', 'c']:
+            shutil.copy(in_file, in_dir / f'{name}.json')
+
+        # Directory of WEPs, in parallel
+        result = runner.invoke(prospective, ['-i', str(in_dir), '-o', str(d / 'out'), '-j', '2'])
+        assert result.exit_code == 0, result.output
+        assert sorted(p.name for p in (d / 'out').iterdir()) == ['a.json', 'b.json', 'c.json']
+        lines = result.output.splitlines()
+        assert len(lines) == 4
+        assert all(line.startswith('OK') for line in lines[:3])
+        assert lines[-1] == '3 converted, 0 failed'
+
+        # Glob, with one invalid WEP
+        (in_dir / 'd.json').write_text('{"States": {"bad": {}}}')
+        result = runner.invoke(prospective, ['-i', str(in_dir / '[bd].json'), '-o', str(d / 'out2')])
+        assert result.exit_code == 1
+        lines = result.output.splitlines()
+        assert lines[0].startswith('OK') and lines[0].endswith('b.json')
+        assert lines[1].startswith('FAILED') and 'd.json' in lines[1]
+        assert lines[-1] == '1 converted, 1 failed'
+        assert not (d / 'out2' / 'd.json').exists()
+
+        # Recursive glob, with WEPs of the same name in different directories
+        for sub in ['x', 'y/z']:
+            (in_dir / sub).mkdir(parents=True)
+            shutil.copy(in_file, in_dir / sub / 'a.json')
+        result = runner.invoke(prospective, ['-i', str(in_dir / '**' / 'a.json'), '-o', str(d / 'out3')])
+        assert result.exit_code == 0, result.output
+        assert result.output.splitlines()[-1] == '3 converted, 0 failed'
+        assert sorted(p.relative_to(d / 'out3').as_posix() for p in (d / 'out3').rglob('*.json')) == [
+            'a.json', 'x/a.json', 'y/z/a.json']
+
+
+def test_validate_rocrate_reports_all_problems():
+    report = _prospective.validate_rocrate({
+        '@context': 'https://w3id.org/ro/crate/1.1/context',
+        '@graph': [
+            {'@id': 'a', '@type': 'File'},
+            {'@type': 'File'},
+            {'@id': 'b'},
+            {'@id': 'a', '@type': 'Dataset'},
+            'not an item',
+            {'@id': 'c', '@type': 5},
+        ]
+    })
+
+    assert not report
+    assert [(p.index, p.id, p.message) for p in report.problems] == [
+        (1, None, 'missing @id'),
+        (2, 'b', 'missing @type'),
+        (3, 'a', 'duplicate @id, first seen at @graph[0]'),
+        (4, None, 'item is str, expected dict'),
+        (5, 'c', '@type is int, expected str or list'),
+    ]
+
+    # Malformed top level
+    assert [str(p) for p in _prospective.validate_rocrate({'@graph': {}}).problems] == [
+        'missing @context', '@graph is dict, expected list']
+    assert [str(p) for p in _prospective.validate_rocrate([]).problems] == ['crate is list, expected dict']
+
+    # Valid, and linear on large graphs
+    graph = [{'@id': f'#{i}', '@type': 'File'} for i in range(200_000)]
+    report = _prospective.validate_rocrate({'@context': 'ctx', '@graph': graph})
+    assert report and report.valid and report.problems == []
+
+
+def test_validate_rocrate_without_asserts():
+    """Validation must not rely on assert, which is stripped by python -O"""
+    code = (
+        'from lp_sdk.parser.prospective import validate_rocrate;'
+        'print(bool(validate_rocrate({"@context": "ctx", "@graph": [{"@id": "a"}]})))'
+    )
+    result = subprocess.run([sys.executable, '-O', '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
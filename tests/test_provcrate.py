@@ -1,4 +1,5 @@
 import json
+import os
 import shutil
 import tempfile
 import pytest
@@ -10,6 +11,8 @@ from lp_sdk.provenance import LpProvCrate
 from lp_sdk.validation.util import CrateParts
 from lp_sdk.validation.comparator import Comparator
 
+GLOBUS_WEP = Path(__file__).parent / 'data' / 'globus_prov' / 'WEP.json'
+
 
 def test_create_prov_crate():
     """
@@ -159,7 +162,8 @@ def test_create_prov_crate():
     comp.compare(actual)
 
 
-def test_create_prov_crate_from_cwl():
+@pytest.mark.parametrize('lean', [False, True])
+def test_create_prov_crate_from_cwl(lean):
     """
     Testing/TDD of tooling to recreate the example provenance crate from https://www.researchobject.org/workflow-run-crate/profiles/provenance_run_crate
     This code will recreate the above test using a more automated approach, from the CWL file.
@@ -172,7 +176,7 @@ def test_create_prov_crate_from_cwl():
         input_cwl = Path(shutil.copy(input_cwl, d))
 
         # Build crate from CWL file
-        crate = LpProvCrate(d)
+        crate = LpProvCrate(d, lean=lean)
         crate.build_from_cwl(input_cwl)
 
         # TODO: this is considered prospective - but runcrate gets this by running the workflow
@@ -332,3 +336,191 @@ def test_prov_crate_from_wep():
                        CrateParts.other, CrateParts.orchestration], [],
                       expected)
     comp.compare(actual)
+
+
+def test_add_parameter_cached():
+    crate = LpProvCrate('.')
+    props = {'@type': 'FormalParameter', 'additionalType': 'File'}
+    first = crate.add_parameter('wf#input', 'input', props)
+    second = crate.add_parameter('wf#input', properties={'defaultValue': 'a.txt'})
+    assert second is first
+    assert crate.crate.get('wf#input') is first
+    assert first.properties() == {'@id': 'wf#input', '@type': 'FormalParameter', 'additionalType': 'File',
+                                  'name': 'input', 'defaultValue': 'a.txt'}
+    assert props == {'@type': 'FormalParameter', 'additionalType': 'File'}
+
+
+def test_add_parameters_and_steps_bulk():
+    crate = LpProvCrate('.')
+    existing = crate.add_parameter('wf#a', 'a')
+    params = crate.add_parameters([('wf#a', 'a', {'@type': 'FormalParameter'}), ('wf#b', 'b', None),
+                                   ('wf#b', None, {'additionalType': 'File'})])
+    assert params[0] is existing
+    assert params[1] is params[2]
+    assert params[1].properties() == {'@id': 'wf#b', '@type': 'Thing', 'name': 'b', 'additionalType': 'File'}
+    assert existing.type == 'FormalParameter'
+
+    steps = crate.add_steps((f'wf#main/step{i}', str(i)) for i in range(3))
+    assert [step['position'] for step in steps] == ['0', '1', '2']
+    assert all(crate.crate.get(step.id) is step for step in steps)
+
+
+def _build_crate(d: Path, lean: bool, build) -> dict:
+    crate = LpProvCrate(d, lean=lean)
+    build(crate)
+    crate.add_software('software', 'cwltool 1.0.20181012180214')
+    crate.write()
+    with open(d / 'ro-crate-metadata.json') as f:
+        return json.load(f)
+
+
+def _normalize_graph(data: dict) -> dict:
+    """@graph by id, with random ParameterConnection ids replaced by their source/target"""
+    connections = {item['@id']: f"{item['sourceParameter']['@id']}->{item['targetParameter']['@id']}"
+                   for item in data['@graph'] if item['@type'] == 'ParameterConnection'}
+    encoded = json.dumps(data['@graph'])
+    for id, replacement in connections.items():
+        encoded = encoded.replace(json.dumps(id), json.dumps(replacement))
+    return {item['@id']: item for item in json.loads(encoded)}
+
+
+@pytest.mark.parametrize('fixture', ['cwl', 'wep'])
+def test_lean_crate_matches_rocrate(fixture, globus_wep_parser):
+    if fixture == 'cwl':
+        source = Path(__file__).parent / 'data' / 'cwl_prov' / 'packed.cwl'
+
+        def build(crate):
+            crate.build_from_cwl(crate.path / source.name)
+    else:
+        source = GLOBUS_WEP
+
+        def build(crate):
+            crate.build_from_wep(crate.path / source.name, globus_wep_parser)
+
+    graphs = {}
+    for lean in (False, True):
+        with tempfile.TemporaryDirectory() as d:
+            d = Path(d)
+            shutil.copy(source, d)
+            graphs[lean] = _build_crate(d, lean, build)
+            assert (d / source.name).is_file()
+
+    regular, lean = ({'@context': graphs[mode]['@context'], '@graph': list(_normalize_graph(graphs[mode]).values())}
+                     for mode in (False, True))
+    assert lean['@context'] == regular['@context']
+    assert _normalize_graph(lean) == _normalize_graph(regular)
+    for expected, actual in [(regular, lean), (lean, regular)]:
+        Comparator([CrateParts.prospective, CrateParts.metadata, CrateParts.other, CrateParts.orchestration], [],
+                   expected).compare(actual)
+
+
+def test_lean_crate_get():
+    crate = LpProvCrate('.', lean=True)
+    param = crate.add_parameter('wf#input', 'input')
+    assert crate.get('wf#input') is param
+    assert crate.crate.get('wf#input') is None
+    assert crate.get('./') is crate.crate.root_dataset
+
+    # Ids are formatted as for regular entities
+    for lean in (False, True):
+        crate = LpProvCrate('.', lean=lean)
+        assert crate.add_software('cwltool', 'cwltool').id == '#cwltool'
+        assert crate.get('#cwltool')['name'] == 'cwltool'
+
+
+@pytest.mark.parametrize('lean', [False, True])
+def test_deterministic_ids(lean, globus_wep_parser):
+    outputs = []
+    for _ in range(2):
+        with tempfile.TemporaryDirectory() as d:
+            d = Path(d)
+            crate = LpProvCrate(d, lean=lean, deterministic_ids=True, date_published='2024-01-01T00:00:00')
+            crate.build_from_wep(Path(shutil.copy(GLOBUS_WEP, d)), globus_wep_parser)
+            crate.write()
+            outputs.append((d / 'ro-crate-metadata.json').read_bytes())
+
+    assert outputs[0] == outputs[1]
+    connections = [item for item in json.loads(outputs[0])['@graph'] if item['@type'] == 'ParameterConnection']
+    assert len(connections) == 4
+
+    crate = LpProvCrate('.', deterministic_ids=True)
+    assert crate.add_parameter_connection('a', 'b').id == crate.add_parameter_connection('a', 'b').id
+    assert crate.add_parameter_connection('a', 'b').id != crate.add_parameter_connection('b', 'a').id
+
+
+def test_build_from_cwl_cache(tmp_path, monkeypatch):
+    from lp_sdk.provenance import cwl
+    source = Path(__file__).parent / 'data' / 'cwl_prov' / 'packed.cwl'
+    cache_dir = tmp_path / 'cache'
+
+    def build(name, cache_dir=None):
+        d = tmp_path / name
+        d.mkdir()
+        crate = LpProvCrate(d, deterministic_ids=True, date_published='2024-01-01T00:00:00')
+        crate.build_from_cwl(Path(shutil.copy(source, d)), cache_dir=cache_dir)
+        crate.write()
+        return (d / 'ro-crate-metadata.json').read_bytes()
+
+    uncached = build('uncached')
+    assert build('first', cache_dir) == uncached
+    assert len(list(cache_dir.glob('*.json'))) == 1
+
+    # Cached definitions are used without parsing the CWL
+    def fail(*args, **kwargs):
+        raise AssertionError('CWL should not be parsed')
+    monkeypatch.setattr(cwl.convert, 'get_workflow', fail)
+    assert build('second', cache_dir) == uncached
+
+
+@pytest.mark.parametrize('lean', [False, True])
+def test_build_from_cwl_nested(tmp_path, lean):
+    source = Path(__file__).parent / 'data' / 'cwl_nested' / 'packed.cwl'
+    crate = LpProvCrate(tmp_path, lean=lean)
+    added_tools = []
+    add_tool = crate.add_tool
+    crate.add_tool = lambda id, *args: added_tools.append(id) or add_tool(id, *args)
+    crate.build_from_cwl(Path(shutil.copy(source, tmp_path)))
+    crate.write()
+
+    with open(tmp_path / 'ro-crate-metadata.json') as f:
+        graph = {item['@id']: item for item in json.load(f)['@graph']}
+
+    # Each tool is added once, although revtool.cwl is run by three steps
+    assert added_tools == ['packed.cwl#revtool.cwl', 'packed.cwl#inner.cwl', 'packed.cwl#sorttool.cwl']
+
+    wf = graph['packed.cwl']
+    assert [s['@id'] for s in wf['step']] == ['packed.cwl#main/rev', 'packed.cwl#main/inner',
+                                             'packed.cwl#main/rev_again']
+    assert [p['@id'] for p in wf['hasPart']] == ['packed.cwl#revtool.cwl', 'packed.cwl#inner.cwl']
+    assert graph['packed.cwl#main/rev_again']['workExample'] == {'@id': 'packed.cwl#revtool.cwl'}
+
+    inner = graph['packed.cwl#inner.cwl']
+    assert inner['@type'] == ['SoftwareSourceCode', 'ComputationalWorkflow', 'HowTo']
+    assert [s['@id'] for s in inner['step']] == ['packed.cwl#inner.cwl/rev', 'packed.cwl#inner.cwl/sorted']
+    assert [p['@id'] for p in inner['hasPart']] == ['packed.cwl#revtool.cwl', 'packed.cwl#sorttool.cwl']
+    assert inner['input'] == [{'@id': 'packed.cwl#inner.cwl/input'}]
+    assert graph['packed.cwl#inner.cwl/sorted']['position'] == '1'
+    assert graph['packed.cwl#revtool.cwl']['input'] == [{'@id': 'packed.cwl#revtool.cwl/input'}]
+
+
+@pytest.mark.parametrize('lean', [False, True])
+def test_incremental_rebuild(tmp_path, lean, globus_wep_parser):
+    """
+    Rebuilding an unchanged workflow into the same directory leaves the metadata as is, although each build has a new
+    datePublished
+    """
+    wep_file = Path(shutil.copy(GLOBUS_WEP, tmp_path))
+    metadata = tmp_path / 'ro-crate-metadata.json'
+
+    def _rebuild(**kwargs):
+        crate = LpProvCrate(tmp_path, lean=lean, deterministic_ids=True)
+        crate.build_from_wep(wep_file, globus_wep_parser)
+        crate.write(incremental=True, **kwargs)
+        rewritten = metadata.stat().st_mtime_ns != 0
+        os.utime(metadata, ns=(0, 0))
+        return rewritten
+
+    assert _rebuild()
+    assert not _rebuild()
+    # compact output differs, so the metadata is rewritten (in lean mode, which streams the metadata)
+    assert _rebuild(compact=True) == lean
@@ -1,12 +1,14 @@
+import hashlib
 import json
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from rocrate.model import ContextEntity
 
 from lp_sdk.parser.retrospective import format_retro_rocrate, write_retro_rocrate
-from lp_sdk.retrospective.crate import DistStepCrate
+from lp_sdk.retrospective.crate import JOURNAL_NAME, DistStepCrate
 from lp_sdk.validation.util import CrateParts
 from lp_sdk.validation.comparator import Comparator
 
@@ -326,5 +328,103 @@ def test_retrospective():
     print(result)
 
 
+def test_format_retro_rocrate_deterministic_ids():
+    data = {'runtime': 120, 'platform': 'Ubuntu 20.04'}
+    crate = format_retro_rocrate(data, deterministic_ids=True)
+    assert crate == format_retro_rocrate({'platform': 'Ubuntu 20.04', 'runtime': 120}, deterministic_ids=True)
+    changed = format_retro_rocrate({**data, 'runtime': 121}, deterministic_ids=True)
+    assert crate['@graph'][0]['@id'] != changed['@graph'][0]['@id']
+    assert format_retro_rocrate(data)['@graph'][0]['@id'] != format_retro_rocrate(data)['@graph'][0]['@id']
+
+
+def _record_step(crate: DistStepCrate, outputs: list[str]):
+    crate.add_position(1)
+    agent = crate.add_agent('#agent', 'agent')
+    props = [crate.add_property(f'#pv-{i}', f'p{i}', str(i)) for i in range(3)]
+    files = [crate.add_file(name, describe=True) for name in outputs]
+    create = crate.add_create_action('#create', {
+        'object': [{'@id': p.id} for p in props],
+        'result': [{'@id': f.id} for f in files],
+    })
+    control = crate.add_control_action('#control', 'step', create)
+    crate.add_organize_action('#organize', 'run', {}, agent, [control], create)
+
+
+def _step_graph(path: Path) -> dict:
+    """@graph by id, with the random id of the HowToStep and the root's datePublished replaced"""
+    with open(path / 'ro-crate-metadata.json') as f:
+        graph = {e['@id']: e for e in json.load(f)['@graph']}
+    step_id = graph['#distributed_step']['step']['@id']
+    graph['step'] = {**graph.pop(step_id), '@id': 'step'}
+    graph['#distributed_step']['step'] = {'@id': 'step'}
+    graph['./'].pop('datePublished')
+    return graph
+
+
+def test_step_crate_journal(tmp_path):
+    outputs = ['a.txt', 'b.txt']
+    for name in ('direct', 'journal'):
+        (tmp_path / name).mkdir()
+        for output in outputs:
+            (tmp_path / name / output).write_text(output)
+
+    crate = DistStepCrate(tmp_path / 'direct')
+    _record_step(crate, outputs)
+    crate.add_property('#pv-3', 'p3', '3')
+    crate.add_property('#pv-5', 'p5', '5')
+    crate.write()
+
+    with DistStepCrate(tmp_path / 'journal', journal=True) as crate:
+        _record_step(crate, outputs)
+        assert not (tmp_path / 'journal' / 'ro-crate-metadata.json').exists()
+        # Other processes may record to the same journal, while it is open here
+        with DistStepCrate(tmp_path / 'journal', journal=True) as other:
+            other.add_property('#pv-3', 'p3', '3')
+    assert crate._journal_fd is None
+    # A record cut short (e.g.: by the task being killed) is ignored
+    with open(tmp_path / 'journal' / JOURNAL_NAME, 'a') as f:
+        f.write('{"add":{"@id":"#pv-4"')
+    with DistStepCrate(tmp_path / 'journal', journal=True) as crate:
+        crate.add_property('#pv-5', 'p5', '5')
+        crate.compact()
+        assert crate._journal_fd is None
+
+    assert not (tmp_path / 'journal' / JOURNAL_NAME).exists()
+    graph = _step_graph(tmp_path / 'journal')
+    assert graph == _step_graph(tmp_path / 'direct')
+    assert graph['a.txt']['sha256'] == hashlib.sha256(b'a.txt').hexdigest()
+    assert '#pv-3' in graph and '#pv-4' not in graph
+
+
+def test_step_crate_journal_write(tmp_path):
+    """write in journal mode keeps the existing crate, and what was recorded"""
+    crate = DistStepCrate(tmp_path)
+    crate.add_property('#pv-1', 'p1', '1')
+    crate.write()
+
+    with DistStepCrate(tmp_path, journal=True) as crate:
+        crate.add_property('#pv-2', 'p2', '2')
+        crate.write()
+        assert not crate.journal
+
+    assert not (tmp_path / JOURNAL_NAME).exists()
+    with open(tmp_path / 'ro-crate-metadata.json') as f:
+        graph = {e['@id']: e for e in json.load(f)['@graph']}
+    assert graph['#pv-1']['value'] == '1' and graph['#pv-2']['value'] == '2'
+
+
+def test_step_crate_journal_concurrent(tmp_path):
+    def record(i):
+        with DistStepCrate(tmp_path, journal=True) as crate:
+            for j in range(200):
+                crate.add_property(f'#pv-{i}-{j}', 'p', 'x' * 1000)
+
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(record, range(4)))
+    with open(tmp_path / JOURNAL_NAME) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 800
+
+
 if __name__ == '__main__':
     test_retrospective()
\ No newline at end of file
@@ -0,0 +1,56 @@
+import copy
+import gzip
+import json
+
+from lp_sdk.parser.wep_cache import ParseCache, canonical_hash
+from lp_sdk.parser.wep_parsing import parse_states
+
+
+def test_canonical_hash_ignores_key_order():
+    assert canonical_hash({'a': 1, 'b': [1, 2]}) == canonical_hash({'b': [1, 2], 'a': 1})
+    assert canonical_hash({'a': 1}) != canonical_hash({'a': 2})
+
+
+def test_parse_cache_memory(input_data, wep_data):
+    cache = ParseCache()
+    result = cache.parse_states(wep_data, input_data)
+    assert result == parse_states(wep_data, input_data)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # An equal (but not identical) document is a hit
+    assert cache.parse_states(copy.deepcopy(wep_data), input_data) is result
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A trusted parse may reuse a validated result, but not the other way around
+    assert cache.parse_states(wep_data, input_data, trusted=True) is result
+    changed = {**input_data, 'input': {**input_data['input'], 'extra': 1}}
+    trusted = cache.parse_states(wep_data, changed, trusted=True)
+    assert cache.parse_states(wep_data, changed) is not trusted
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_parse_cache_lru(input_data, wep_data):
+    cache = ParseCache(maxsize=1)
+    cache.parse_states(wep_data, input_data)
+    cache.parse_states(wep_data, {**input_data, 'other': 1})
+    cache.parse_states(wep_data, input_data)
+    assert (cache.hits, cache.misses) == (0, 3)
+
+
+def test_parse_cache_dir(input_data, wep_data, tmp_path):
+    result = ParseCache(cache_dir=tmp_path).parse_states(wep_data, input_data)
+    entries = list(tmp_path.rglob('*.json.gz'))
+    assert len(entries) == 1
+
+    # A new cache (e.g.: in another process) loads the stored result
+    cache = ParseCache(cache_dir=tmp_path)
+    assert cache.parse_states(wep_data, input_data) == result
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    # Corrupt entries are re-parsed and replaced
+    entries[0].write_bytes(b'not gzip')
+    cache = ParseCache(cache_dir=tmp_path)
+    assert cache.parse_states(wep_data, input_data) == result
+    assert cache.misses == 1
+    with gzip.open(entries[0]) as f:
+        json.load(f)
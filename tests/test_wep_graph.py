@@ -0,0 +1,149 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from lp_sdk.parser.wep_graph import WepCycleError, WepGraph, WepGraphError
+from lp_sdk.parser.wep_parsing import compile_wep, parse_states
+
+TEST_DIR = Path(__file__).parent
+
+
+def _compute(name: str, payload: str | None = None, **kwargs) -> dict:
+    return {
+        'Comment': name,
+        'Type': 'Action',
+        'ActionUrl': 'https://compute.actions.globus.org',
+        'Parameters': {'tasks': [{'endpoint': 'ep', 'function': name, 'payload.$': payload or f'$.input.{name}'}]},
+        'ResultPath': f'$.{name}',
+        **kwargs,
+    }
+
+
+def _flow() -> dict:
+    """Choice -> (A | B) -> Parallel(C, D -> E) -> Map(F) -> Wait -> Done"""
+    return {
+        'StartAt': 'Check',
+        'States': {
+            'Check': {
+                'Type': 'Choice',
+                'Choices': [{'Variable': '$.input.a', 'BooleanEquals': True, 'Next': 'A'}],
+                'Default': 'B',
+            },
+            'A': _compute('A', Next='Fork'),
+            'B': {'Type': 'Pass', 'Next': 'Fork'},
+            'Fork': {
+                'Type': 'Parallel',
+                'Branches': [
+                    {'StartAt': 'C', 'States': {'C': _compute('C', End=True)}},
+                    {'StartAt': 'D', 'States': {'D': _compute('D', Next='E'), 'E': _compute('E', End=True)}},
+                ],
+                'Next': 'Each',
+            },
+            'Each': {
+                'Type': 'Map',
+                'ItemsPath': '$.input.items',
+                'Iterator': {'StartAt': 'F', 'States': {'F': _compute('F', '$.payload', End=True)}},
+                'Next': 'Pause',
+            },
+            'Pause': {'Type': 'Wait', 'Seconds': 5, 'Next': 'Done'},
+            'Done': {'Type': 'Succeed'},
+            'Unreachable': {'Type': 'Pass', 'End': True},
+        }
+    }
+
+
+def test_graph_structure():
+    graph = WepGraph(_flow())
+
+    assert len(graph) == 7, 'Unreachable states are excluded'
+    assert [node.name for node in graph] == ['Check', 'A', 'B', 'Fork', 'Each', 'Pause', 'Done']
+    assert graph.nodes['Check'].next == ['A', 'B']
+    assert graph.positions()['Fork'] == 3
+
+    branches = [(name, i, [n.name for n in branch]) for name, i, branch in graph.iter_branches()]
+    assert branches == [('Fork', 0, ['C']), ('Fork', 1, ['D', 'E']), ('Each', 0, ['F'])]
+
+
+def test_graph_topological_positions():
+    """Join states come after every path leading to them"""
+    graph = WepGraph({
+        'StartAt': 'S',
+        'States': {
+            'S': {'Type': 'Choice', 'Choices': [{'Next': 'Long1'}], 'Default': 'Join'},
+            'Long1': {'Type': 'Pass', 'Next': 'Long2'},
+            'Long2': {'Type': 'Pass', 'Next': 'Join'},
+            'Join': {'Type': 'Pass', 'End': True, 'Catch': []},
+        }
+    })
+    positions = graph.positions()
+    assert positions['Join'] > positions['Long2'] > positions['Long1'] > positions['S']
+
+
+def test_graph_cycles():
+    flow = {
+        'StartAt': 'A',
+        'States': {
+            'A': {'Type': 'Pass', 'Next': 'B'},
+            'B': {'Type': 'Pass', 'Next': 'C'},
+            'C': {'Type': 'Choice', 'Choices': [{'Next': 'B'}], 'Default': 'D'},
+            'D': {'Type': 'Succeed'},
+        }
+    }
+    with pytest.raises(WepCycleError) as e:
+        WepGraph(flow)
+    assert e.value.cycle in (['B', 'C', 'B'], ['C', 'B', 'C'])
+
+    # Self loop
+    flow['States']['D'] = {'Type': 'Pass', 'Next': 'D'}
+    flow['States']['C'] = {'Type': 'Pass', 'Next': 'D'}
+    with pytest.raises(WepCycleError, match='D -> D'):
+        WepGraph(flow)
+
+    # Cycles inside a Parallel branch
+    with pytest.raises(WepCycleError):
+        WepGraph({'StartAt': 'P', 'States': {'P': {'Type': 'Parallel', 'End': True, 'Branches': [flow]}}})
+
+
+def test_graph_errors():
+    with pytest.raises(WepGraphError, match='unknown state Missing'):
+        WepGraph({'StartAt': 'A', 'States': {'A': {'Type': 'Pass', 'Next': 'Missing'}}})
+    with pytest.raises(WepGraphError, match='StartAt'):
+        WepGraph({'StartAt': 'A', 'States': {}})
+    with pytest.raises(NotImplementedError, match='Task'):
+        WepGraph({'StartAt': 'A', 'States': {'A': {'Type': 'Task', 'End': True}}})
+
+
+def test_parse_states_with_control_flow():
+    flow = _flow()
+    flow_input = {'input': {name: {'x': name} for name in 'ACDE'}}
+    # Map iterations are bound against their item
+    flow_input['input']['items'] = [{'payload': {'x': 'F0'}}, {'payload': {'x': 'F1'}}]
+
+    compute_states, transfer_states = parse_states(flow, flow_input)
+    assert [(s.name, s.position) for s in compute_states] == [
+        ('A', 0), ('C', 1), ('D', 2), ('E', 3), ('F', 4), ('F', 4)]
+    assert transfer_states == []
+    assert [s.tasks[0].payload.value for s in compute_states[-2:]] == [{'x': 'F0'}, {'x': 'F1'}]
+    assert [s.tasks[0].payload.key for s in compute_states[-2:]] == ['$.payload', '$.payload']
+    assert '$.input.items' in compile_wep(flow).paths and '$.payload' not in compile_wep(flow).paths
+
+    assert [kind for _, kind in compile_wep(flow).order] == [
+        'choice', 'compute', 'pass', 'parallel', 'compute', 'compute', 'compute', 'map', 'compute', 'wait', 'succeed']
+
+    flow_input['input']['items'] = {'payload': {}}
+    with pytest.raises(TypeError, match='ItemsPath .* of Map state Each is not a list'):
+        parse_states(flow, flow_input)
+    flow['States']['Each']['ItemSelector'] = {'value.$': '$$.Map.Item.Value'}
+    with pytest.raises(ValueError, match='Map state Each'):
+        compile_wep(flow)
+    flow['States']['A']['ActionUrl'] = 'https://actions.example.org'
+    with pytest.raises(ValueError, match='https://actions.example.org of state A'):
+        compile_wep(flow)
+
+
+def test_graph_globus_wep():
+    with open(TEST_DIR / 'data' / 'globus_prov' / 'WEP.json') as f:
+        wep = json.load(f)
+    graph = WepGraph(wep)
+    assert [node.name for node in graph] == list(wep['States'])
@@ -1,23 +1,9 @@
 import json
-from pathlib import Path
 
 import pytest
 
-from lp_sdk.parser.wep_parsing import InputValue, Task, TransferItem, ComputeState, TransferState, parse_states
-
-
-@pytest.fixture
-def input_data():
-    input_fname = Path(__file__).parent / 'data' / 'globus_prov' / 'input.json'
-    with open(input_fname) as f:
-        return json.load(f)
-
-
-@pytest.fixture
-def wep_data():
-    wep_fname = Path(__file__).parent / 'data' / 'globus_prov' / 'WEP.json'
-    with open(wep_fname) as f:
-        return json.load(f)
+from lp_sdk.parser.wep_parsing import InputValue, Task, TransferItem, ComputeState, TransferState, parse_states, \
+    compile_path, PathLookupError, compile_wep, compile_expression, ExpressionError
 
 
 def test_parse_task(input_data):
@@ -60,13 +46,21 @@ def test_parse_transfer_item(input_data):
                                             value='/rev_text/input/test.txt')
     assert t.recursive == InputValue(key='$.input.to_compute_transfer_recursive', value=False)
 
-    # Crate transfer: .= not yet implemented
-    with pytest.raises(NotImplementedError):
-        t = TransferItem.parse({
-            "recursive": True,
-            "source_path.=": "`$.RevTxt.details.results[0].task_id` + '.crate'",
-            "destination_path.=": "`$.input._provenance_crate_destination_directory` + '/' + `$.RevTxt.details.results[0].task_id`"
-        }, input_data)
+    # Crate transfer: .= expressions, referencing the results of a previous state
+    crate_transfer = {
+        "recursive": True,
+        "source_path.=": "`$.RevTxt.details.results[0].task_id` + '.crate'",
+        "destination_path.=": "`$.input._provenance_crate_destination_directory` + '/' + `$.RevTxt.details.results[0].task_id`"
+    }
+    with pytest.raises(PathLookupError, match="segment 'RevTxt' not found"):
+        TransferItem.parse(crate_transfer, input_data)
+
+    run_data = {**input_data, 'RevTxt': {'details': {'results': [{'task_id': 'abc-123'}]}}}
+    t = TransferItem.parse(crate_transfer, run_data)
+    assert t.recursive is True
+    assert t.source_path == InputValue(key=crate_transfer['source_path.='], value='abc-123.crate')
+    assert t.destination_path == InputValue(key=crate_transfer['destination_path.='],
+                                            value='13fe2659-32f1-414b-b3a8-2c6b096967da/abc-123')
 
 
 def test_parse_compute_state(input_data):
@@ -150,3 +144,125 @@ def test_parse_full_wep(input_data, wep_data):
     assert compute_states[0].position == 0
     assert compute_states[1].name == 'SortTxt'
     assert compute_states[1].position == 1
+
+
+def test_compile_path(input_data):
+    path = compile_path('$.input.RevTxt.input_file')
+    assert path.segments == ('input', 'RevTxt', 'input_file')
+    assert path(input_data) == '/rev_text/input/test.txt'
+    assert compile_path('$.input.RevTxt.input_file') is path, 'Compiled paths should be cached'
+
+    assert compile_path('$')(input_data) is input_data
+    assert compile_path('$.a.results[0].task_id').segments == ('a', 'results', 0, 'task_id')
+    assert compile_path('$.a.results[0].task_id')({'a': {'results': [{'task_id': 'x'}]}}) == 'x'
+
+    # Paths without the leading $ are relative to the root, as earlier versions accepted
+    assert compile_path('input.RevTxt.input_file')(input_data) == '/rev_text/input/test.txt'
+    assert compile_path('a.results[0]').segments == ('a', 'results', 0)
+
+    for bad in ['$input', '$.a..b', '$.a[b]', 'a..b', '']:
+        with pytest.raises(ValueError):
+            compile_path(bad)
+
+
+def test_compile_path_errors(input_data):
+    with pytest.raises(PathLookupError, match=r"segment 'missing' not found in \$\.input\.RevTxt") as e:
+        compile_path('$.input.RevTxt.missing.value')(input_data)
+    assert isinstance(e.value, KeyError)
+    assert e.value.segment == 'missing'
+
+    with pytest.raises(PathLookupError, match=r"segment 1 not found in \$\.a\.results"):
+        compile_path('$.a.results[1]')({'a': {'results': [{}]}})
+
+    # Missing lookups are reported from parse
+    with pytest.raises(PathLookupError, match='not_an_endpoint'):
+        Task.parse({
+            "endpoint.$": "$.input.not_an_endpoint",
+            "function.$": "$.input.rev_txt_function_id",
+            "payload.$": "$.input.RevTxt"
+        }, input_data)
+
+
+def test_parse_present_none(input_data):
+    # A present null lookup is reported, rather than treated as missing (and the .= form used instead)
+    with pytest.raises(TypeError, match='None is not a string'):
+        Task.parse({"endpoint": "e", "function.$": None, "function.=": "'f'", "payload": "p"}, input_data)
+    with pytest.raises(TypeError, match='None is not a string'):
+        compile_wep({'StartAt': 'A', 'States': {'A': {
+            'Type': 'Action', 'ActionUrl': 'https://compute.actions.globus.org', 'Comment': None, 'ResultPath': '$.A',
+            'Parameters': {'tasks': [{"endpoint": "e", "function.$": None, "function.=": "'f'", "payload": "p"}]},
+            'End': True}}})
+
+
+def test_compile_wep(input_data, wep_data):
+    plan = compile_wep(wep_data)
+    assert plan.order == [
+        ('TransferToCompute', 'transfer'),
+        ('RevTxt', 'compute'),
+        ('Transfer_provenance_rev_txt', 'provenance'),
+        ('TransferRT_ST', 'transfer'),
+        ('SortTxt', 'compute'),
+        ('Transfer_provenance_sort_txt', 'provenance'),
+        ('TransferFromCompute', 'transfer'),
+    ]
+    assert '$.input.RevTxt' in plan.paths
+    assert '$.input.from_compute_transfer_recursive' in plan.paths
+
+    assert plan.bind(input_data) == parse_states(wep_data, input_data)
+
+    # Bind different inputs to the same plan
+    other = json.loads(json.dumps(input_data))
+    other['input']['RevTxt']['input_file'] = '/other.txt'
+    results = plan.bind_many([input_data, other])
+    assert results[0] == parse_states(wep_data, input_data)
+    assert results[1] == parse_states(wep_data, other)
+    assert results[1][0][0].tasks[0].payload.value['input_file'] == '/other.txt'
+
+    del other['input']['RevTxt']
+    with pytest.raises(PathLookupError, match='RevTxt'):
+        plan.bind(other)
+
+
+def test_compile_expression():
+    data = {'a': 'x', 'b': {'c': ['y', 'z']}, 'n': 2}
+
+    expr = compile_expression("`$.a` + '/' + `$.b.c[1]`")
+    assert expr(data) == 'x/z'
+    assert expr.paths == ['$.a', '$.b.c[1]']
+    assert compile_expression("`$.a` + '/' + `$.b.c[1]`") is expr, 'Compiled expressions should be cached'
+
+    assert compile_expression("'it\\'s' + \"\" + `$.a`")(data) == "it's" + 'x'
+    assert compile_expression("(`$.n` + 1) + 0.5")(data) == 3.5
+    assert compile_expression("  `$.a`  ")(data) == 'x'
+
+    for bad in ["`$.a` - 1", "`$.a` +", "(`$.a`", "`$.a` `$.a`", "len(`$.a`)", "`a.b`"]:
+        with pytest.raises(ValueError):
+            compile_expression(bad)
+    with pytest.raises(ExpressionError, match='position 6'):
+        compile_expression("`$.a` - 1")
+
+
+def test_parse_full_wep_with_expressions(input_data, wep_data):
+    """Provenance transfers generated by DistCrateTransfer use .= expressions"""
+    plan = compile_wep(wep_data)
+    assert '$.RevTxt.details.results[0].task_id' not in plan.paths, 'Provenance transfers are not parsed'
+
+    state = wep_data['States']['Transfer_provenance_rev_txt']
+    item = TransferItem.parse(state['Parameters']['transfer_items'][0],
+                              {**input_data, 'RevTxt': {'details': {'results': [{'task_id': 'task'}]}}})
+    assert item.source_path.value == 'task.crate'
+
+
+def test_parse_states_trusted(input_data, wep_data):
+    validated = parse_states(wep_data, input_data)
+    trusted = parse_states(wep_data, input_data, trusted=True)
+    assert trusted == validated
+
+    compute_states, transfer_states = trusted
+    assert isinstance(compute_states[0], ComputeState)
+    assert isinstance(compute_states[0].tasks[0], Task)
+    assert isinstance(compute_states[0].tasks[0].payload, InputValue)
+    assert isinstance(transfer_states[0].transfer_items[0], TransferItem)
+    assert compute_states[1].model_dump() == validated[0][1].model_dump()
+
+    assert compile_wep(wep_data).bind_many([input_data], trusted=True) == [validated]